@@ -1,6 +1,15 @@
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request
 from flask_cors import CORS
+from werkzeug.exceptions import HTTPException
+from json_provider import JSONProvider
+from config import Config
 import os
+
+try:
+    from flask_compress import Compress
+    COMPRESS_AVAILABLE = True
+except ImportError:
+    COMPRESS_AVAILABLE = False
 import platform
 
 # Set up Poppler path for PDF processing on Windows
@@ -10,26 +19,32 @@ if platform.system() == 'Windows':
         r'C:\Program Files\poppler\Library\bin',
         r'C:\Program Files (x86)\poppler\Library\bin'
     ]
-    for path in poppler_paths:
-        if os.path.exists(path):
-            os.environ['POPPLER_PATH'] = path
-            break
+    POPPLER_PATH = next((p for p in poppler_paths if os.path.exists(p)), None)
+    if POPPLER_PATH:
+        os.environ['POPPLER_PATH'] = POPPLER_PATH
 
 # Initialize Flask app
 app = Flask(__name__)
+app.json = JSONProvider(app)
 CORS(app)
 
-# Configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///ocr_compliance.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['UPLOAD_FOLDER'] = 'uploads'
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
-app.config['ALLOWED_EXTENSIONS'] = {'png', 'jpg', 'jpeg', 'pdf', 'tiff'}
+# Configuration (all settings are defined in config.py)
+app.config.from_object(Config)
 
 # Initialize database
 from database import db
 db.init_app(app)
 
+# Initialize response cache (shared by all server workers; file-backed by
+# default, set CACHE_TYPE=RedisCache to use the Celery Redis instance)
+from cache import cache
+cache.init_app(app)
+
+# Compress JSON responses on the wire (Brotli preferred, gzip fallback);
+# OCR text compresses very well
+if COMPRESS_AVAILABLE:
+    Compress(app)
+
 # Create upload folder if it doesn't exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
@@ -38,11 +53,23 @@ from routes import ocr_routes, analytics_routes
 app.register_blueprint(ocr_routes.bp)
 app.register_blueprint(analytics_routes.bp)
 
+# JSON errors for every route; handlers raise (abort, get_or_404, or any
+# unexpected exception) instead of catching errors themselves
+@app.errorhandler(HTTPException)
+def handle_http_error(e):
+    return jsonify({'error': e.description}), e.code
+
+@app.errorhandler(Exception)
+def handle_unexpected_error(e):
+    app.logger.exception('Unhandled error on %s', request.path)
+    return jsonify({'error': str(e)}), 500
+
 @app.route('/health', methods=['GET'])
 def health_check():
     return jsonify({'status': 'healthy', 'message': 'OCR Compliance API is running'}), 200
 
 if __name__ == '__main__':
+    # Development server only; production runs asgi:asgi_app under uvicorn
     with app.app_context():
         db.create_all()
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    app.run(debug=os.getenv('FLASK_ENV', 'development') == 'development', host='0.0.0.0', port=5000)
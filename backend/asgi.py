@@ -0,0 +1,16 @@
+"""
+ASGI entry point - serves the Flask app under uvicorn for concurrent uploads
+
+Run with:
+    uvicorn asgi:asgi_app --workers 4 --loop uvloop --http httptools
+"""
+
+from asgiref.wsgi import WsgiToAsgi
+from app import app
+from database import db
+
+# Create tables once per worker; `python app.py` does the same for the dev server
+with app.app_context():
+    db.create_all()
+
+asgi_app = WsgiToAsgi(app)
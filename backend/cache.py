@@ -0,0 +1,6 @@
+"""
+Cache initialization module to avoid circular imports
+"""
+from flask_caching import Cache
+
+cache = Cache()
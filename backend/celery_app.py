@@ -0,0 +1,24 @@
+"""
+Celery initialization module - task queue between HTTP uploads and OCR workers
+
+Run workers with (one pool per queue so multilingual jobs can be scaled separately):
+    celery -A celery_app.celery worker -Q ocr -c 4 --prefetch-multiplier=1
+    celery -A celery_app.celery worker -Q ocr_multilingual -c 2 --prefetch-multiplier=1
+"""
+from celery import Celery
+from config import Config
+
+REDIS_URL = Config.REDIS_URL
+
+# Queue names for standard and multilingual OCR jobs
+OCR_QUEUE = Config.OCR_QUEUE
+MULTILINGUAL_OCR_QUEUE = Config.MULTILINGUAL_OCR_QUEUE
+
+celery = Celery('ocr', broker=REDIS_URL, backend=REDIS_URL, include=['tasks'])
+celery.conf.update(
+    task_acks_late=True,  # redeliver the task, which reclaims its document, if a worker dies mid-OCR
+    worker_prefetch_multiplier=1,  # one OCR job per worker process at a time
+    result_expires=24 * 3600,
+    task_default_queue=OCR_QUEUE,
+    task_track_started=True,  # report STARTED while a worker is running OCR
+)
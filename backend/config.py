@@ -4,19 +4,65 @@ Configuration settings for the Flask application
 
 import os
 from dotenv import load_dotenv
+from sqlalchemy.engine import make_url
 
 load_dotenv()
 
+
+def engine_options(database_uri):
+    """
+    SQLAlchemy engine options for the database behind a URI
+    
+    check_same_thread only exists for sqlite3, and pool sizing only applies
+    to the QueuePool used for server databases (in-memory SQLite uses a
+    single-connection pool that rejects it).
+    
+    Args:
+        database_uri: SQLAlchemy database URI
+        
+    Returns:
+        Dictionary for SQLALCHEMY_ENGINE_OPTIONS
+    """
+    if make_url(database_uri).get_backend_name() == 'sqlite':
+        return {'connect_args': {'check_same_thread': False}}
+    return {
+        'pool_size': 25,
+        'max_overflow': 25,
+        'pool_pre_ping': True,
+        'pool_recycle': 1800,
+        'pool_use_lifo': True  # reuse the most recent connection; idle extras can time out
+    }
+
+
 class Config:
     """Base configuration"""
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URI', 'sqlite:///ocr_compliance.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+    
+    # Response cache for analytics endpoints
+    CACHE_TYPE = os.getenv('CACHE_TYPE', 'FileSystemCache')  # or 'RedisCache'
+    CACHE_DIR = os.getenv('CACHE_DIR', '.cache')
+    CACHE_REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+    CACHE_DEFAULT_TIMEOUT = 60
+    
+    # Response compression (Flask-Compress)
+    COMPRESS_MIMETYPES = ['application/json']
+    COMPRESS_MIN_SIZE = 500
+    COMPRESS_ALGORITHM = ['br', 'gzip']
+    COMPRESS_BR_LEVEL = 4
+    
+    # Task queue (Celery broker and result backend)
+    REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+    OCR_QUEUE = os.getenv('OCR_QUEUE', 'ocr')
+    MULTILINGUAL_OCR_QUEUE = os.getenv('MULTILINGUAL_OCR_QUEUE', 'ocr_multilingual')
+    OCR_CLAIM_TIMEOUT = int(os.getenv('OCR_CLAIM_TIMEOUT', '1800'))  # seconds before a stuck 'processing' document can be reclaimed
     
     # Upload settings
     UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'uploads')
-    MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))
-    ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'pdf', 'tiff', 'bmp'}
+    MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 100 * 1024 * 1024))  # uploads are streamed to disk
+    ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'pdf', 'tiff'}
     
     # OCR Service
     OCR_SERVICE = os.getenv('OCR_SERVICE', 'tesseract')
@@ -33,14 +79,25 @@ class Config:
     AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY')
     AWS_REGION = os.getenv('AWS_REGION', 'us-east-1')
     
+    # OCR result cache keyed by file content hash (empty string disables it)
+    OCR_CACHE_DIR = os.getenv('OCR_CACHE_DIR', '.ocr_cache')
+    OCR_CACHE_SIZE_LIMIT = int(os.getenv('OCR_CACHE_SIZE_LIMIT', 5 * 2 ** 30))
+    
+    # Retry policy for rate-limited OCR backends (HTTP 429), read by services/retry.py
+    OCR_RETRY_ATTEMPTS = int(os.getenv('OCR_RETRY_ATTEMPTS', '3'))
+    
     # Tesseract Configuration
     TESSERACT_CMD = os.getenv('TESSERACT_CMD')
+    OCR_MAX_CONCURRENCY = int(os.getenv('OCR_MAX_CONCURRENCY', os.cpu_count() or 1))
+    PDF_RENDER_WORKERS = int(os.getenv('PDF_RENDER_WORKERS', os.cpu_count() or 1))
     
     # Ollama Configuration (Primary OCR Engine)
     OLLAMA_ENABLED = os.getenv('OLLAMA_ENABLED', 'true').lower() == 'true'
     OLLAMA_ENDPOINT = os.getenv('OLLAMA_ENDPOINT', 'http://localhost:11434')
-    OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'llava:latest')
+    OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'glm-ocr:latest')
     OLLAMA_TIMEOUT = int(os.getenv('OLLAMA_TIMEOUT', '30'))
+    OLLAMA_KEEP_ALIVE = os.getenv('OLLAMA_KEEP_ALIVE', '10m')  # keep model loaded between requests
+    OCR_DEVICE = os.getenv('OCR_DEVICE', 'auto')  # auto, cpu, cuda or cuda:<index>
     
     # Offline Mode
     OFFLINE_MODE = os.getenv('OFFLINE_MODE', 'false').lower() == 'true'
@@ -63,6 +120,7 @@ class TestingConfig(Config):
     DEBUG = True
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///test_ocr_compliance.db'
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
 
 
 config = {
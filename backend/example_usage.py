@@ -210,6 +210,8 @@ def example_batch_processing():
     print("=" * 60)
     
     from services.ocr_service import OCRService
+    from concurrent.futures import ThreadPoolExecutor
+    import asyncio
     import glob
     
     ocr = OCRService()
@@ -221,21 +223,33 @@ def example_batch_processing():
         print("⚠ No images found in uploads folder")
         return
     
-    print(f"\nFound {len(image_files)} images to process")
+    # Cap concurrent Tesseract runs to the available cores
+    max_workers = int(os.getenv('OCR_BATCH_WORKERS', os.cpu_count() or 1))
+    print(f"\nFound {len(image_files)} images to process ({max_workers} workers)")
     
-    results = []
-    for image_path in image_files:
-        print(f"\nProcessing: {os.path.basename(image_path)}")
-        try:
-            result = ocr.process_image(image_path)
-            results.append({
-                'file': os.path.basename(image_path),
-                'confidence': result['confidence_score'],
-                'drug_name': result.get('drug_name', 'Not found')
-            })
-            print(f"  ✓ Confidence: {result['confidence_score']:.2%}")
-        except Exception as e:
-            print(f"  ✗ Error: {str(e)}")
+    async def process_all():
+        loop = asyncio.get_running_loop()
+        sem = asyncio.Semaphore(max_workers)
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            async def worker(image_path):
+                async with sem:
+                    try:
+                        result = await loop.run_in_executor(executor, ocr.process_image, image_path)
+                    except Exception as e:
+                        print(f"  ✗ {os.path.basename(image_path)}: {str(e)}")
+                        return None
+                
+                print(f"  ✓ {os.path.basename(image_path)}: {result['confidence_score']:.2%}")
+                return {
+                    'file': os.path.basename(image_path),
+                    'confidence': result['confidence_score'],
+                    'drug_name': result.get('drug_name', 'Not found')
+                }
+            
+            return await asyncio.gather(*[worker(p) for p in image_files])
+    
+    results = [r for r in asyncio.run(process_all()) if r is not None]
     
     # Summary
     print("\n--- Batch Processing Summary ---")
@@ -1,43 +1,165 @@
+from datetime import datetime, timedelta
 from database import db
-from datetime import datetime
-from sqlalchemy.dialects.postgresql import JSON
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.dialects.postgresql import JSONB, insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import deferred
 
-class Document(db.Model):
+class utcnow(FunctionElement):
+    """Current UTC timestamp, generated by the database"""
+    type = db.DateTime()
+    inherit_cache = True
+
+
+@compiles(utcnow)
+def _default_utcnow(element, compiler, **kw):
+    return 'CURRENT_TIMESTAMP'
+
+
+@compiles(utcnow, 'sqlite')
+def _sqlite_utcnow(element, compiler, **kw):
+    # UTC with microseconds, in the same text format SQLAlchemy binds
+    # datetimes as, so stored values compare correctly against parameters
+    # (CURRENT_TIMESTAMP drops the fraction, and '...:16' < '...:16.000000')
+    return "strftime('%Y-%m-%d %H:%M:%f000', 'now')"
+
+
+@compiles(utcnow, 'postgresql')
+def _pg_utcnow(element, compiler, **kw):
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
+
+class SerializableMixin:
+    """
+    Builds to_dict() from a class-level tuple of column names
+    
+    Loaded values are read straight from the instance __dict__, skipping the
+    instrumented attribute descriptors; expired or deferred columns fall back
+    to normal attribute access so they are still loaded on demand.
+    """
+    SERIALIZE_FIELDS = ()
+    
+    def _serialize(self, fields):
+        loaded = self.__dict__
+        return {name: loaded[name] if name in loaded else getattr(self, name) for name in fields}
+    
+    def to_dict(self):
+        return self._serialize(self.SERIALIZE_FIELDS)
+
+
+class Document(SerializableMixin, db.Model):
     """Model for uploaded documents"""
     __tablename__ = 'documents'
+    __table_args__ = (
+        db.Index('ix_docs_status_date', 'status', 'upload_date'),
+        # Keyset pagination order for the document list
+        db.Index('ix_docs_date_id', 'upload_date', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(255), nullable=False)
     file_path = db.Column(db.String(500), nullable=False)
     file_type = db.Column(db.String(50), nullable=False)
     file_size = db.Column(db.Integer)
-    upload_date = db.Column(db.DateTime, default=datetime.utcnow)
+    content_hash = db.Column(db.String(64), index=True)  # SHA-256 of the uploaded bytes
+    upload_date = db.Column(db.DateTime, server_default=utcnow())
     status = db.Column(db.String(50), default='pending')  # pending, processing, completed, failed
+    claimed_at = db.Column(db.DateTime)  # when the status was last claimed
     
     # Relationships
     ocr_results = db.relationship('OCRResult', backref='document', lazy=True, cascade='all, delete-orphan')
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'filename': self.filename,
-            'file_type': self.file_type,
-            'file_size': self.file_size,
-            'upload_date': self.upload_date.isoformat(),
-            'status': self.status
-        }
+    @classmethod
+    def claim(cls, document_id, from_statuses, to_status='processing', stale_after=None):
+        """
+        Atomically move a document between statuses
+        
+        The status check and update run as one conditional UPDATE, so when
+        several requests or workers race for the same document only one wins.
+        Commits the transaction.
+        
+        Args:
+            document_id: ID of the document to claim
+            from_statuses: Statuses the document may currently be in
+            to_status: Status to set on success
+            stale_after: Also take over a 'processing' claim older than this
+                many seconds, left behind by a request or worker that died
+            
+        Returns:
+            True if this caller claimed the document, False otherwise
+        """
+        claimable = cls.status.in_(from_statuses)
+        if stale_after is not None:
+            cutoff = datetime.utcnow() - timedelta(seconds=stale_after)
+            claimable = db.or_(claimable, db.and_(
+                cls.status == 'processing',
+                cls.claimed_at < cutoff
+            ))
+        
+        result = db.session.execute(
+            db.update(cls)
+            .where(cls.id == document_id, claimable)
+            .values(status=to_status, claimed_at=utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount == 1
+    
+    @classmethod
+    def set_status(cls, document_id, status):
+        """
+        Set a document's status with a direct UPDATE
+        
+        Unlike assigning to an expired instance, this does not reload the row
+        first. Does not commit.
+        
+        Args:
+            document_id: ID of the document to update
+            status: New status
+        """
+        db.session.execute(
+            db.update(cls)
+            .where(cls.id == document_id)
+            .values(status=status)
+            .execution_options(synchronize_session=False)
+        )
+    
+    SERIALIZE_FIELDS = (
+        'id',
+        'filename',
+        'file_type',
+        'file_size',
+        'upload_date',
+        'status'
+    )
 
 
-class OCRResult(db.Model):
+class OCRResult(SerializableMixin, db.Model):
     """Model for OCR processing results"""
     __tablename__ = 'ocr_results'
+    __table_args__ = (
+        # Partial index: only controlled-substance rows are ever filtered on
+        db.Index(
+            'ix_ocr_controlled', 'controlled_substance',
+            postgresql_where=db.text('controlled_substance'),
+            sqlite_where=db.text('controlled_substance')
+        ),
+        # GIN index for metadata containment (@>) queries; PostgreSQL only
+        db.Index(
+            'ix_ocr_metadata_gin', 'ocr_metadata',
+            postgresql_using='gin',
+            postgresql_ops={'ocr_metadata': 'jsonb_path_ops'}
+        ).ddl_if(dialect='postgresql'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    document_id = db.Column(db.Integer, db.ForeignKey('documents.id'), nullable=False)
-    extracted_text = db.Column(db.Text)
-    confidence_score = db.Column(db.Float)
+    document_id = db.Column(db.Integer, db.ForeignKey('documents.id'), nullable=False, index=True)
+    extracted_text = deferred(db.Column(db.Text))  # loaded on first access; undefer() where needed
+    confidence_score = db.Column(db.Float, index=True)
     processing_time = db.Column(db.Float)  # in seconds
-    processed_date = db.Column(db.DateTime, default=datetime.utcnow)
+    processed_date = db.Column(db.DateTime, server_default=utcnow())
     
     # Pharmaceutical specific fields
     drug_name = db.Column(db.String(255))
@@ -45,6 +167,7 @@ class OCRResult(db.Model):
     expiry_date = db.Column(db.String(50))
     manufacturer = db.Column(db.String(255))
     controlled_substance = db.Column(db.Boolean, default=False)
+    compliance_score = db.Column(db.Float, index=True)  # score (0-100) from the latest validation
     
     # Ollama migration fields
     ocr_engine = db.Column(db.String(50), default='tesseract')  # 'ollama' or 'tesseract'
@@ -52,89 +175,182 @@ class OCRResult(db.Model):
     fallback_used = db.Column(db.Boolean, default=False)
     fallback_reason = db.Column(db.String(255))  # reason for fallback
     pages_processed = db.Column(db.Integer)  # for PDF documents
-    ocr_metadata = db.Column(JSON, default={})  # additional metadata
+    # additional metadata; binary JSONB on PostgreSQL, plain JSON elsewhere
+    ocr_metadata = db.Column(db.JSON().with_variant(JSONB, 'postgresql'), nullable=False, default=dict, server_default='{}')
     
     # Relationships
     compliance_checks = db.relationship('ComplianceCheck', backref='ocr_result', lazy=True, cascade='all, delete-orphan')
     errors = db.relationship('ErrorDetection', backref='ocr_result', lazy=True, cascade='all, delete-orphan')
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'document_id': self.document_id,
-            'extracted_text': self.extracted_text,
-            'confidence_score': self.confidence_score,
-            'processing_time': self.processing_time,
-            'processed_date': self.processed_date.isoformat(),
-            'drug_name': self.drug_name,
-            'batch_number': self.batch_number,
-            'expiry_date': self.expiry_date,
-            'manufacturer': self.manufacturer,
-            'controlled_substance': self.controlled_substance,
-            'ocr_engine': self.ocr_engine,
-            'model_name': self.model_name,
-            'fallback_used': self.fallback_used,
-            'fallback_reason': self.fallback_reason,
-            'pages_processed': self.pages_processed,
-            'ocr_metadata': self.ocr_metadata
-        }
-
-
-class ComplianceCheck(db.Model):
+    SERIALIZE_FIELDS = (
+        'id',
+        'document_id',
+        'extracted_text',
+        'confidence_score',
+        'processing_time',
+        'processed_date',
+        'drug_name',
+        'batch_number',
+        'expiry_date',
+        'manufacturer',
+        'controlled_substance',
+        'compliance_score',
+        'ocr_engine',
+        'model_name',
+        'fallback_used',
+        'fallback_reason',
+        'pages_processed',
+        'ocr_metadata'
+    )
+    
+    SUMMARY_FIELDS = (
+        'id',
+        'document_id',
+        'confidence_score',
+        'processing_time',
+        'processed_date',
+        'drug_name',
+        'batch_number',
+        'expiry_date',
+        'manufacturer',
+        'controlled_substance',
+        'compliance_score',
+        'ocr_engine',
+        'model_name',
+        'fallback_used',
+        'pages_processed'
+    )
+    
+    def to_summary_dict(self):
+        """Slim representation for list views; omits extracted_text and ocr_metadata"""
+        return self._serialize(self.SUMMARY_FIELDS)
+
+
+class ComplianceCheck(SerializableMixin, db.Model):
     """Model for compliance validation results"""
     __tablename__ = 'compliance_checks'
+    __table_args__ = (
+        db.Index('ix_cc_date_status', 'checked_date', 'status'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    ocr_result_id = db.Column(db.Integer, db.ForeignKey('ocr_results.id'), nullable=False)
+    ocr_result_id = db.Column(db.Integer, db.ForeignKey('ocr_results.id'), nullable=False, index=True)
     rule_id = db.Column(db.Integer, db.ForeignKey('compliance_rules.id'))
     check_type = db.Column(db.String(100))  # format, content, regulatory
-    status = db.Column(db.String(50))  # passed, failed, warning
+    status = db.Column(db.String(50), index=True)  # passed, failed, warning
     message = db.Column(db.Text)
     severity = db.Column(db.String(50))  # low, medium, high, critical
-    checked_date = db.Column(db.DateTime, default=datetime.utcnow)
+    checked_date = db.Column(db.DateTime, server_default=utcnow())
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'ocr_result_id': self.ocr_result_id,
-            'rule_id': self.rule_id,
-            'check_type': self.check_type,
-            'status': self.status,
-            'message': self.message,
-            'severity': self.severity,
-            'checked_date': self.checked_date.isoformat()
-        }
-
-
-class ErrorDetection(db.Model):
+    SERIALIZE_FIELDS = (
+        'id',
+        'ocr_result_id',
+        'rule_id',
+        'check_type',
+        'status',
+        'message',
+        'severity',
+        'checked_date'
+    )
+
+
+class ComplianceDailyRollup(SerializableMixin, db.Model):
+    """Per-day compliance check counts by status, maintained as checks are written"""
+    __tablename__ = 'compliance_daily_rollup'
+    
+    day = db.Column(db.Date, primary_key=True)
+    status = db.Column(db.String(50), primary_key=True)  # passed, failed, warning
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    @classmethod
+    def increment(cls, day, status_counts):
+        """
+        Add to the counts for a day, creating rows as needed
+        
+        Uses a single INSERT ... ON CONFLICT DO UPDATE on PostgreSQL and SQLite.
+        Does not commit.
+        
+        Args:
+            day: Date the checks belong to
+            status_counts: Mapping of status to count delta (may be negative)
+        """
+        if not status_counts:
+            return
+        
+        upsert = {'postgresql': pg_insert, 'sqlite': sqlite_insert}.get(
+            db.session.get_bind().dialect.name
+        )
+        if upsert is None:
+            for status, delta in status_counts.items():
+                row = db.session.get(cls, (day, status)) or cls(day=day, status=status, count=0)
+                row.count += delta
+                db.session.add(row)
+            return
+        
+        stmt = upsert(cls).values([
+            {'day': day, 'status': status, 'count': delta}
+            for status, delta in status_counts.items()
+        ])
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=[cls.day, cls.status],
+            set_={'count': cls.count + stmt.excluded.count}
+        ))
+    
+    SERIALIZE_FIELDS = (
+        'day',
+        'status',
+        'count'
+    )
+
+
+@event.listens_for(ComplianceDailyRollup.__table__, 'after_create')
+def _backfill_daily_rollup(target, connection, **kw):
+    """
+    Seed a newly created rollup table from the compliance checks already stored
+    
+    Without this, deleting a document validated before the table existed
+    would subtract checks that were never counted.
+    """
+    if not inspect(connection).has_table(ComplianceCheck.__tablename__):
+        return
+    
+    day = db.func.date(ComplianceCheck.checked_date)
+    connection.execute(target.insert().from_select(
+        ['day', 'status', 'count'],
+        db.select(day, ComplianceCheck.status, db.func.count())
+        .where(ComplianceCheck.checked_date.is_not(None), ComplianceCheck.status.is_not(None))
+        .group_by(day, ComplianceCheck.status)
+    ))
+
+
+class ErrorDetection(SerializableMixin, db.Model):
     """Model for detected errors in OCR results"""
     __tablename__ = 'error_detections'
     
     id = db.Column(db.Integer, primary_key=True)
-    ocr_result_id = db.Column(db.Integer, db.ForeignKey('ocr_results.id'), nullable=False)
-    error_type = db.Column(db.String(100))  # spelling, format, missing_data, invalid_data
-    field_name = db.Column(db.String(100))
+    ocr_result_id = db.Column(db.Integer, db.ForeignKey('ocr_results.id'), nullable=False, index=True)
+    error_type = db.Column(db.String(100), index=True)  # spelling, format, missing_data, invalid_data
+    field_name = db.Column(db.String(100), index=True)
     expected_value = db.Column(db.String(255))
     actual_value = db.Column(db.String(255))
     confidence = db.Column(db.Float)
     suggestion = db.Column(db.String(255))
-    detected_date = db.Column(db.DateTime, default=datetime.utcnow)
+    detected_date = db.Column(db.DateTime, server_default=utcnow())
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'ocr_result_id': self.ocr_result_id,
-            'error_type': self.error_type,
-            'field_name': self.field_name,
-            'expected_value': self.expected_value,
-            'actual_value': self.actual_value,
-            'confidence': self.confidence,
-            'suggestion': self.suggestion,
-            'detected_date': self.detected_date.isoformat()
-        }
-
-
-class ComplianceRule(db.Model):
+    SERIALIZE_FIELDS = (
+        'id',
+        'ocr_result_id',
+        'error_type',
+        'field_name',
+        'expected_value',
+        'actual_value',
+        'confidence',
+        'suggestion',
+        'detected_date'
+    )
+
+
+class ComplianceRule(SerializableMixin, db.Model):
     """Model for compliance rules"""
     __tablename__ = 'compliance_rules'
     
@@ -145,27 +361,26 @@ class ComplianceRule(db.Model):
     pattern = db.Column(db.String(500))  # regex pattern or validation rule
     severity = db.Column(db.String(50))  # low, medium, high, critical
     is_active = db.Column(db.Boolean, default=True)
-    created_date = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_date = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_date = db.Column(db.DateTime, server_default=utcnow())
+    updated_date = db.Column(db.DateTime, server_default=utcnow(), onupdate=utcnow())
     
     # Relationships
     compliance_checks = db.relationship('ComplianceCheck', backref='rule', lazy=True)
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'rule_name': self.rule_name,
-            'rule_type': self.rule_type,
-            'description': self.description,
-            'pattern': self.pattern,
-            'severity': self.severity,
-            'is_active': self.is_active,
-            'created_date': self.created_date.isoformat(),
-            'updated_date': self.updated_date.isoformat()
-        }
-
-
-class AuditLog(db.Model):
+    SERIALIZE_FIELDS = (
+        'id',
+        'rule_name',
+        'rule_type',
+        'description',
+        'pattern',
+        'severity',
+        'is_active',
+        'created_date',
+        'updated_date'
+    )
+
+
+class AuditLog(SerializableMixin, db.Model):
     """Model for audit trail"""
     __tablename__ = 'audit_logs'
     
@@ -175,15 +390,14 @@ class AuditLog(db.Model):
     entity_id = db.Column(db.Integer)
     user_id = db.Column(db.String(100))
     details = db.Column(db.Text)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, server_default=utcnow())
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'action': self.action,
-            'entity_type': self.entity_type,
-            'entity_id': self.entity_id,
-            'user_id': self.user_id,
-            'details': self.details,
-            'timestamp': self.timestamp.isoformat()
-        }
+    SERIALIZE_FIELDS = (
+        'id',
+        'action',
+        'entity_type',
+        'entity_id',
+        'user_id',
+        'details',
+        'timestamp'
+    )
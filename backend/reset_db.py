@@ -15,6 +15,10 @@ print(f"📁 Database path: {db_path}")
 if os.path.exists(db_path):
     try:
         os.remove(db_path)
+        # Drop WAL journal files too so they are not replayed into the new database
+        for suffix in ('-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
         print(f"✅ Deleted old database: {db_path}")
     except Exception as e:
         print(f"❌ Error deleting database: {str(e)}")
@@ -34,9 +38,10 @@ try:
         db.create_all()
         print("✅ Database created successfully with new schema!")
         print("\n📊 Tables created:")
-        print("   - documents")
-        print("   - ocr_results (with ocr_engine, model_name, ocr_metadata columns)")
+        print("   - documents (with content_hash, claimed_at columns)")
+        print("   - ocr_results (with ocr_engine, model_name, ocr_metadata, compliance_score columns; JSONB + GIN index on PostgreSQL)")
         print("   - compliance_checks")
+        print("   - compliance_daily_rollup")
         print("   - error_detections")
         print("   - compliance_rules")
         print("   - audit_logs")
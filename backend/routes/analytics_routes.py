@@ -3,187 +3,207 @@ Analytics Routes - API endpoints for analytics and statistics
 """
 
 from flask import Blueprint, jsonify
-from sqlalchemy import func
+from sqlalchemy import case, func, select
 from database import db
-from models.database import Document, OCRResult, ComplianceCheck, ErrorDetection
+from cache import cache
+from models.database import Document, OCRResult, ComplianceCheck, ComplianceDailyRollup, ErrorDetection
 from datetime import datetime, timedelta
 
 bp = Blueprint('analytics', __name__, url_prefix='/api/analytics')
 
+# Seconds an analytics response is served from cache; short enough that
+# polling dashboards stay fresh even without explicit invalidation
+ANALYTICS_CACHE_TIMEOUT = 15
+
+# Cache keys for each analytics view, cleared whenever OCR data changes
+ANALYTICS_CACHE_KEYS = [
+    'analytics/dashboard',
+    'analytics/accuracy',
+    'analytics/compliance-trends',
+    'analytics/error-analysis',
+    'analytics/controlled-substances'
+]
+
+def invalidate_analytics_cache():
+    """Drop cached analytics responses so dashboards reflect new results"""
+    cache.delete_many(*ANALYTICS_CACHE_KEYS)
+
 @bp.route('/dashboard', methods=['GET'])
+@cache.cached(timeout=ANALYTICS_CACHE_TIMEOUT, key_prefix='analytics/dashboard')
 def get_dashboard_stats():
     """Get dashboard statistics"""
-    try:
-        # Total documents processed
-        total_documents = Document.query.count()
-        
-        # Documents by status
-        status_counts = db.session.query(
+    week_ago = datetime.utcnow() - timedelta(days=7)
+    
+    # Documents by status, with recent activity (last 7 days), in one pass
+    status_rows = db.session.execute(
+        select(
             Document.status,
-            func.count(Document.id)
-        ).group_by(Document.status).all()
-        
-        # Average confidence score
-        avg_confidence = db.session.query(
-            func.avg(OCRResult.confidence_score)
-        ).scalar() or 0
-        
-        # Total compliance checks
-        total_checks = ComplianceCheck.query.count()
-        passed_checks = ComplianceCheck.query.filter_by(status='passed').count()
-        failed_checks = ComplianceCheck.query.filter_by(status='failed').count()
-        
-        # Total errors detected
-        total_errors = ErrorDetection.query.count()
-        
-        # Recent activity (last 7 days)
-        week_ago = datetime.utcnow() - timedelta(days=7)
-        recent_documents = Document.query.filter(
-            Document.upload_date >= week_ago
-        ).count()
-        
-        return jsonify({
-            'success': True,
-            'data': {
-                'total_documents': total_documents,
-                'status_breakdown': {status: count for status, count in status_counts},
-                'average_confidence': round(avg_confidence, 2),
-                'compliance': {
-                    'total_checks': total_checks,
-                    'passed': passed_checks,
-                    'failed': failed_checks,
-                    'pass_rate': round((passed_checks / total_checks * 100) if total_checks > 0 else 0, 2)
-                },
-                'total_errors': total_errors,
-                'recent_activity': recent_documents
-            }
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+            func.count(Document.id),
+            func.count(Document.id).filter(Document.upload_date >= week_ago)
+        ).group_by(Document.status)
+    ).all()
+    
+    status_counts = [(status, count) for status, count, _ in status_rows]
+    total_documents = sum(count for _, count in status_counts)
+    recent_documents = sum(recent for _, _, recent in status_rows)
+    
+    # Compliance check counts (one scan of compliance_checks), average
+    # confidence and error total in one round-trip
+    total_checks, passed_checks, failed_checks, avg_confidence, total_errors = db.session.execute(
+        select(
+            func.count(ComplianceCheck.id),
+            func.count(ComplianceCheck.id).filter(ComplianceCheck.status == 'passed'),
+            func.count(ComplianceCheck.id).filter(ComplianceCheck.status == 'failed'),
+            select(func.avg(OCRResult.confidence_score)).scalar_subquery(),
+            select(func.count(ErrorDetection.id)).scalar_subquery()
+        )
+    ).one()
+    avg_confidence = avg_confidence or 0
+    
+    return jsonify({
+        'success': True,
+        'data': {
+            'total_documents': total_documents,
+            'status_breakdown': {status: count for status, count in status_counts},
+            'average_confidence': round(avg_confidence, 2),
+            'compliance': {
+                'total_checks': total_checks,
+                'passed': passed_checks,
+                'failed': failed_checks,
+                'pass_rate': round((passed_checks / total_checks * 100) if total_checks > 0 else 0, 2)
+            },
+            'total_errors': total_errors,
+            'recent_activity': recent_documents
+        }
+    }), 200
 
 @bp.route('/accuracy', methods=['GET'])
+@cache.cached(timeout=ANALYTICS_CACHE_TIMEOUT, key_prefix='analytics/accuracy')
 def get_accuracy_metrics():
     """Get OCR accuracy metrics"""
-    try:
-        # Confidence score distribution
-        confidence_ranges = [
-            (0.0, 0.5, 'Low'),
-            (0.5, 0.7, 'Medium'),
-            (0.7, 0.9, 'High'),
-            (0.9, 1.0, 'Very High')
-        ]
-        
-        distribution = []
-        for min_val, max_val, label in confidence_ranges:
-            count = OCRResult.query.filter(
-                OCRResult.confidence_score >= min_val,
-                OCRResult.confidence_score < max_val
-            ).count()
-            distribution.append({
-                'range': label,
-                'count': count
-            })
-        
-        # Average processing time
-        avg_processing_time = db.session.query(
-            func.avg(OCRResult.processing_time)
-        ).scalar() or 0
-        
-        return jsonify({
-            'success': True,
-            'data': {
-                'confidence_distribution': distribution,
-                'average_processing_time': round(avg_processing_time, 2)
-            }
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    # Confidence score distribution
+    confidence_ranges = [
+        (0.0, 0.5, 'Low'),
+        (0.5, 0.7, 'Medium'),
+        (0.7, 0.9, 'High'),
+        (0.9, 1.0, 'Very High')
+    ]
+    
+    # Bucket every result in one scan; rows outside all ranges fall into a
+    # NULL bucket that still contributes to the processing time average
+    bucket = case(
+        *[((OCRResult.confidence_score >= min_val) & (OCRResult.confidence_score < max_val), label)
+          for min_val, max_val, label in confidence_ranges],
+        else_=None
+    ).label('bucket')
+    rows = db.session.execute(
+        select(
+            bucket,
+            func.count(OCRResult.id),
+            func.sum(OCRResult.processing_time),
+            func.count(OCRResult.processing_time)
+        ).group_by(bucket)
+    ).all()
+    
+    counts = {label: count for label, count, _, _ in rows}
+    distribution = [
+        {'range': label, 'count': counts.get(label, 0)}
+        for _, _, label in confidence_ranges
+    ]
+    
+    # Average processing time
+    time_total = sum(total or 0 for _, _, total, _ in rows)
+    time_count = sum(count for _, _, _, count in rows)
+    avg_processing_time = (time_total / time_count) if time_count > 0 else 0
+    
+    return jsonify({
+        'success': True,
+        'data': {
+            'confidence_distribution': distribution,
+            'average_processing_time': round(avg_processing_time, 2)
+        }
+    }), 200
 
 @bp.route('/compliance-trends', methods=['GET'])
+@cache.cached(timeout=ANALYTICS_CACHE_TIMEOUT, key_prefix='analytics/compliance-trends')
 def get_compliance_trends():
     """Get compliance trends over time"""
-    try:
-        # Get compliance checks grouped by date
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        
-        trends = db.session.query(
-            func.date(ComplianceCheck.checked_date).label('date'),
-            ComplianceCheck.status,
-            func.count(ComplianceCheck.id).label('count')
-        ).filter(
-            ComplianceCheck.checked_date >= thirty_days_ago
-        ).group_by(
-            func.date(ComplianceCheck.checked_date),
-            ComplianceCheck.status
-        ).all()
-        
-        # Format data
-        trend_data = {}
-        for date, status, count in trends:
-            date_str = date.isoformat()
-            if date_str not in trend_data:
-                trend_data[date_str] = {'passed': 0, 'failed': 0, 'warning': 0}
-            trend_data[date_str][status] = count
-        
-        return jsonify({
-            'success': True,
-            'data': trend_data
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    # Read the pre-aggregated daily rollup instead of scanning raw checks
+    since = (datetime.utcnow() - timedelta(days=30)).date()
+    
+    trends = db.session.execute(
+        select(
+            ComplianceDailyRollup.day,
+            ComplianceDailyRollup.status,
+            ComplianceDailyRollup.count
+        ).where(
+            ComplianceDailyRollup.day >= since,
+            ComplianceDailyRollup.count > 0
+        )
+    ).all()
+    
+    # Format data
+    trend_data = {}
+    for date, status, count in trends:
+        date_str = date.isoformat()
+        if date_str not in trend_data:
+            trend_data[date_str] = {'passed': 0, 'failed': 0, 'warning': 0}
+        trend_data[date_str][status] = count
+    
+    return jsonify({
+        'success': True,
+        'data': trend_data
+    }), 200
 
 @bp.route('/error-analysis', methods=['GET'])
+@cache.cached(timeout=ANALYTICS_CACHE_TIMEOUT, key_prefix='analytics/error-analysis')
 def get_error_analysis():
     """Get error analysis statistics"""
-    try:
-        # Errors by type
-        error_types = db.session.query(
+    # Errors by type
+    error_types = db.session.execute(
+        select(
             ErrorDetection.error_type,
             func.count(ErrorDetection.id).label('count')
-        ).group_by(ErrorDetection.error_type).all()
-        
-        # Most common error fields
-        error_fields = db.session.query(
+        ).group_by(ErrorDetection.error_type)
+    ).all()
+    
+    # Most common error fields
+    error_fields = db.session.execute(
+        select(
             ErrorDetection.field_name,
             func.count(ErrorDetection.id).label('count')
         ).group_by(ErrorDetection.field_name).order_by(
             func.count(ErrorDetection.id).desc()
-        ).limit(10).all()
-        
-        return jsonify({
-            'success': True,
-            'data': {
-                'error_types': [{'type': t, 'count': c} for t, c in error_types],
-                'common_fields': [{'field': f, 'count': c} for f, c in error_fields]
-            }
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        ).limit(10)
+    ).all()
+    
+    return jsonify({
+        'success': True,
+        'data': {
+            'error_types': [{'type': t, 'count': c} for t, c in error_types],
+            'common_fields': [{'field': f, 'count': c} for f, c in error_fields]
+        }
+    }), 200
 
 @bp.route('/controlled-substances', methods=['GET'])
+@cache.cached(timeout=ANALYTICS_CACHE_TIMEOUT, key_prefix='analytics/controlled-substances')
 def get_controlled_substances_stats():
     """Get statistics on controlled substances"""
-    try:
-        total_controlled = OCRResult.query.filter_by(
-            controlled_substance=True
-        ).count()
-        
-        total_results = OCRResult.query.count()
-        
-        percentage = (total_controlled / total_results * 100) if total_results > 0 else 0
-        
-        return jsonify({
-            'success': True,
-            'data': {
-                'total_controlled': total_controlled,
-                'total_documents': total_results,
-                'percentage': round(percentage, 2)
-            }
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    # Both counts in one scan, without loading any OCRResult instances
+    total_controlled, total_results = db.session.execute(
+        select(
+            func.count(OCRResult.id).filter(OCRResult.controlled_substance.is_(True)),
+            func.count(OCRResult.id)
+        )
+    ).one()
+    
+    percentage = (total_controlled / total_results * 100) if total_results > 0 else 0
+    
+    return jsonify({
+        'success': True,
+        'data': {
+            'total_controlled': total_controlled,
+            'total_documents': total_results,
+            'percentage': round(percentage, 2)
+        }
+    }), 200
@@ -3,263 +3,680 @@
 OCR Routes - API endpoints for OCR processing with Ollama
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from werkzeug.utils import secure_filename
+from streaming_form_data import StreamingFormDataParser, ParseFailedException
+from streaming_form_data.targets import FileTarget
 import os
+import uuid
+import base64
+import binascii
+import hashlib
+from collections import Counter, defaultdict
+from datetime import datetime
+from sqlalchemy import func, insert, select, tuple_, update
+from sqlalchemy.orm import undefer
 from database import db
-from models.database import Document, OCRResult
+from models.database import Document, OCRResult, ComplianceCheck, ComplianceDailyRollup, ErrorDetection, utcnow
 from services.ollama_ocr_service import OllamaOCRService
 from services.compliance_service import ComplianceService
 from services.error_detection_service import ErrorDetectionService
+from routes.analytics_routes import invalidate_analytics_cache
+from celery_app import celery, OCR_QUEUE, MULTILINGUAL_OCR_QUEUE
+from config import Config
+from tasks import process_document_task
 
 bp = Blueprint('ocr', __name__, url_prefix='/api/ocr')
 
+# Upload extensions accepted for OCR
+ALLOWED_EXTENSIONS = frozenset({'png', 'jpg', 'jpeg', 'pdf', 'tiff'})
+
+# Statuses from which a document may be (re)processed synchronously
+REPROCESSABLE_STATUSES = ('pending', 'completed', 'failed')
+
+# Page size bounds for the document list
+DOCUMENTS_PAGE_SIZE = 50
+DOCUMENTS_MAX_PAGE_SIZE = 200
+
+# Most OCR results accepted by one batch validation request
+BATCH_VALIDATE_MAX = 1000
+
+# Read uploads from the request stream in 1 MiB chunks
+UPLOAD_CHUNK_SIZE = 1 << 20
+
 # Initialize Ollama OCR service (primary engine)
 ocr_service = OllamaOCRService(
-    ollama_endpoint=os.getenv('OLLAMA_ENDPOINT', 'http://localhost:11434'),
-    model_name=os.getenv('OLLAMA_MODEL', 'glm-ocr:latest'),
-    timeout=int(os.getenv('OLLAMA_TIMEOUT', '30'))
+    ollama_endpoint=Config.OLLAMA_ENDPOINT,
+    model_name=Config.OLLAMA_MODEL,
+    timeout=Config.OLLAMA_TIMEOUT,
+    cache_dir=Config.OCR_CACHE_DIR or None,
+    device=Config.OCR_DEVICE
 )
 compliance_service = ComplianceService()
 error_service = ErrorDetectionService()
 
-def allowed_file(filename):
-    """Check if file extension is allowed"""
-    ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'pdf', 'tiff'}
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+def file_extension(filename):
+    """Return the lower-cased extension of a filename, or '' if it has none"""
+    return filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+
+class HashingFileTarget(FileTarget):
+    """FileTarget that also counts bytes and SHA-256 hashes the upload as it is written"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.size = 0
+        self.complete = False
+        self._hash = hashlib.sha256()
+    
+    def on_data_received(self, chunk: bytes):
+        super().on_data_received(chunk)
+        self.size += len(chunk)
+        self._hash.update(chunk)
+    
+    def on_finish(self):
+        super().on_finish()
+        self.complete = True
+    
+    def discard(self):
+        """Close and delete the partially written file"""
+        if self._fd and not self._fd.closed:
+            self._fd.close()
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+    
+    @property
+    def sha256(self):
+        return self._hash.hexdigest()
+
+def receive_upload():
+    """
+    Stream the multipart 'file' field from request.stream straight to disk
+
+    Bypasses Werkzeug's form parser so the upload is never buffered in memory.
+    Size and content hash are computed in the same pass.
+    
+    Returns:
+        Tuple of (upload, error) - upload is a dict with 'filename', 'file_path',
+        'file_type', 'file_size' and 'content_hash'; error is None on success
+    """
+    if not request.mimetype.startswith('multipart/'):
+        return None, 'No file provided'
+    
+    upload_folder = current_app.config.get('UPLOAD_FOLDER', 'uploads')
+    temp_path = os.path.join(upload_folder, f'.{uuid.uuid4().hex}.part')
+    target = HashingFileTarget(temp_path)
+    
+    try:
+        parser = StreamingFormDataParser(headers=request.headers)
+        parser.register('file', target)
+        while chunk := request.stream.read(UPLOAD_CHUNK_SIZE):
+            parser.data_received(chunk)
+    except ParseFailedException:
+        target.discard()
+        return None, 'Malformed multipart body'
+    except Exception:
+        target.discard()
+        raise
+    
+    error = None
+    file_type = file_extension(target.multipart_filename or '')
+    if target.multipart_filename is not None and not target.complete:
+        # The body ended before the file part's closing boundary
+        error = 'Malformed multipart body'
+    elif target.multipart_filename is None:
+        error = 'No file provided'
+    elif target.multipart_filename == '':
+        error = 'No file selected'
+    elif file_type not in ALLOWED_EXTENSIONS:
+        error = 'Invalid file type'
+    
+    if error:
+        target.discard()
+        return None, error
+    
+    # Store under the content hash so same-named uploads never collide
+    filename = secure_filename(target.multipart_filename)
+    file_path = os.path.join(upload_folder, f'{target.sha256}.{file_type}')
+    os.replace(temp_path, file_path)
+    
+    return {
+        'filename': filename,
+        'file_path': file_path,
+        'file_type': file_type,
+        'file_size': target.size,
+        'content_hash': target.sha256
+    }, None
+
+def duplicate_response(upload):
+    """
+    Short-circuit an upload whose content has already been processed
+    
+    Args:
+        upload: Upload dict returned by receive_upload
+        
+    Returns:
+        Tuple of (response, status code) for the existing result, or None
+    """
+    existing = OCRResult.query.join(Document).filter(
+        Document.content_hash == upload['content_hash'],
+        Document.status == 'completed'
+    ).order_by(OCRResult.processed_date.desc()).first()
+    if existing is None:
+        return None
+    
+    # Keep a single copy on disk unless the upload replaced the original file
+    if os.path.abspath(upload['file_path']) != os.path.abspath(existing.document.file_path):
+        os.remove(upload['file_path'])
+    
+    return jsonify({
+        'success': True,
+        'duplicate': True,
+        'document_id': existing.document_id,
+        'ocr_result_id': existing.id,
+        'data': existing.to_dict()
+    }), 200
+
+def run_ocr(file_path, file_type, use_cache=True):
+    """Run Ollama OCR on a stored file, dispatching on its type (use_cache=False forces a fresh run)"""
+    if file_type == 'pdf':
+        return ocr_service.process_pdf(file_path, use_cache=use_cache)
+    return ocr_service.process_image(file_path, use_cache=use_cache)
+
+def store_ocr_result(document_id, ocr_result):
+    """
+    Add the OCR result row and mark its document completed
+    
+    Both writes join the caller's transaction. The row is flushed so its id
+    and to_dict() can be read before the commit expires it.
+    
+    Args:
+        document_id: ID of the processed Document
+        ocr_result: Dictionary returned by the OCR service
+        
+    Returns:
+        The flushed OCRResult
+    """
+    ocr_record = OCRResult(
+        document_id=document_id,
+        extracted_text=ocr_result['extracted_text'],
+        confidence_score=ocr_result['confidence_score'],
+        processing_time=ocr_result['processing_time'],
+        drug_name=ocr_result.get('drug_name'),
+        batch_number=ocr_result.get('batch_number'),
+        expiry_date=ocr_result.get('expiry_date'),
+        manufacturer=ocr_result.get('manufacturer'),
+        controlled_substance=ocr_result.get('controlled_substance', False),
+        ocr_engine='ollama',
+        model_name=ocr_result.get('model_name'),
+        pages_processed=ocr_result.get('pages_processed'),
+        ocr_metadata=ocr_result.get('ocr_metadata', {})
+    )
+    db.session.add(ocr_record)
+    Document.set_status(document_id, 'completed')
+    db.session.flush()
+    return ocr_record
+
+def ocr_response(document_id, file_path, file_type, include_ids=False, use_cache=True):
+    """
+    Run OCR on a document already marked 'processing' and store the result
+    
+    Args:
+        document_id: ID of the Document to process
+        file_path: Path of the stored upload
+        file_type: File extension of the upload
+        include_ids: Add 'document_id' and 'ocr_result_id' to the response
+        use_cache: Serve a cached result for identical file content
+        
+    Returns:
+        Tuple of (response, status code); the document is marked 'failed'
+        if OCR or saving the result fails
+    """
+    try:
+        ocr_result = run_ocr(file_path, file_type, use_cache=use_cache)
+        ocr_record = store_ocr_result(document_id, ocr_result)
+        response = {'success': True, 'data': ocr_record.to_dict()}
+        if include_ids:
+            response['document_id'] = document_id
+            response['ocr_result_id'] = ocr_record.id
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        Document.set_status(document_id, 'failed')
+        db.session.commit()
+        invalidate_analytics_cache()
+        return jsonify({'error': f'Ollama OCR processing failed: {str(e)}'}), 500
+    
+    invalidate_analytics_cache()
+    return jsonify(response), 200
+
+def process_upload():
+    """
+    Stream an upload to disk, record the document and run OCR on it
+    
+    Returns:
+        Tuple of (response, status code)
+    """
+    # Stream file to disk
+    upload, error = receive_upload()
+    if error:
+        return jsonify({'error': error}), 400
+    
+    # Reuse the stored result for identical content instead of re-running OCR
+    duplicate = duplicate_response(upload)
+    if duplicate is not None:
+        return duplicate
+    
+    # Create document record
+    document = Document(
+        filename=upload['filename'],
+        file_path=upload['file_path'],
+        file_type=upload['file_type'],
+        file_size=upload['file_size'],
+        content_hash=upload['content_hash'],
+        status='processing',
+        claimed_at=utcnow()
+    )
+    db.session.add(document)
+    db.session.flush()
+    document_id = document.id
+    db.session.commit()
+    # The commit returned the connection to the pool; avoid touching
+    # `document` again until OCR finishes so it stays released
+    
+    return ocr_response(document_id, upload['file_path'], upload['file_type'], include_ids=True)
 
 @bp.route('/upload', methods=['POST'])
 def upload_document():
     """Upload and process a document with Ollama OCR"""
-    try:
-        if 'file' not in request.files:
-            return jsonify({'error': 'No file provided'}), 400
-        
-        file = request.files['file']
-        
-        if file.filename == '':
-            return jsonify({'error': 'No file selected'}), 400
-        
-        if not allowed_file(file.filename):
-            return jsonify({'error': 'Invalid file type'}), 400
-        
-        # Save file
-        filename = secure_filename(file.filename)
-        file_path = os.path.join('uploads', filename)
-        file.save(file_path)
-        
-        # Create document record
-        document = Document(
-            filename=filename,
-            file_path=file_path,
-            file_type=filename.rsplit('.', 1)[1].lower(),
-            file_size=os.path.getsize(file_path),
-            status='processing'
-        )
-        db.session.add(document)
-        db.session.commit()
-        
-        # Process with Ollama OCR
-        try:
-            if document.file_type == 'pdf':
-                ocr_result = ocr_service.process_pdf(file_path)
-            else:
-                ocr_result = ocr_service.process_image(file_path)
-            
-            # Save OCR result
-            ocr_record = OCRResult(
-                document_id=document.id,
-                extracted_text=ocr_result['extracted_text'],
-                confidence_score=ocr_result['confidence_score'],
-                processing_time=ocr_result['processing_time'],
-                drug_name=ocr_result.get('drug_name'),
-                batch_number=ocr_result.get('batch_number'),
-                expiry_date=ocr_result.get('expiry_date'),
-                manufacturer=ocr_result.get('manufacturer'),
-                controlled_substance=ocr_result.get('controlled_substance', False),
-                ocr_engine='ollama',
-                model_name=ocr_result.get('model_name'),
-                pages_processed=ocr_result.get('pages_processed')
-            )
-            db.session.add(ocr_record)
-            
-            # Update document status
-            document.status = 'completed'
-            db.session.commit()
-            
-            return jsonify({
-                'success': True,
-                'document_id': document.id,
-                'ocr_result_id': ocr_record.id,
-                'data': ocr_record.to_dict()
-            }), 200
-            
-        except Exception as e:
-            document.status = 'failed'
-            db.session.commit()
-            return jsonify({'error': f'Ollama OCR processing failed: {str(e)}'}), 500
+    return process_upload()
+
+def queue_upload(queue=OCR_QUEUE):
+    """
+    Stream an upload to disk, record the document and queue it for OCR
     
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    Args:
+        queue: Celery queue the OCR task is sent to
+        
+    Returns:
+        Tuple of (response, status code); 202 once the OCR task is queued,
+        200 if identical content was already processed
+    """
+    # Stream file to disk
+    upload, error = receive_upload()
+    if error:
+        return jsonify({'error': error}), 400
+    
+    # Identical content that was already processed needs no new task
+    duplicate = duplicate_response(upload)
+    if duplicate is not None:
+        return duplicate
+    
+    # Create document record
+    document = Document(
+        filename=upload['filename'],
+        file_path=upload['file_path'],
+        file_type=upload['file_type'],
+        file_size=upload['file_size'],
+        content_hash=upload['content_hash'],
+        status='pending'
+    )
+    db.session.add(document)
+    db.session.flush()
+    document_id = document.id
+    db.session.commit()
+    invalidate_analytics_cache()
+    
+    # Hand OCR off to the worker pool
+    task = process_document_task.apply_async((document_id,), queue=queue)
+    
+    return jsonify({
+        'success': True,
+        'document_id': document_id,
+        'task_id': task.id,
+        'status_url': f'{bp.url_prefix}/tasks/{task.id}'
+    }), 202
+
+@bp.route('/upload/async', methods=['POST'])
+def upload_document_async():
+    """Upload a document and queue it for OCR on a background worker"""
+    return queue_upload()
+
+@bp.route('/tasks/<task_id>', methods=['GET'])
+def get_task_status(task_id):
+    """Get the state of a queued OCR task"""
+    task = celery.AsyncResult(task_id)
+    response = {
+        'success': True,
+        'task_id': task_id,
+        'state': task.state
+    }
+    if task.successful():
+        response['result'] = task.result
+    elif task.failed():
+        response['error'] = str(task.result)
+    
+    return jsonify(response), 200
+
+def reprocess_document(document_id):
+    """
+    Run OCR again on an already uploaded document, bypassing the result cache
+    
+    Args:
+        document_id: ID of the Document to process
+        
+    Returns:
+        Tuple of (response, status code); 409 if the document is busy
+    """
+    document = Document.query.get_or_404(document_id, description='Document not found')
+    file_path, file_type = document.file_path, document.file_type
+    
+    # Claim the document so concurrent requests or workers don't process it
+    # twice; the claim commits, so no pooled connection is held during OCR
+    if not Document.claim(document_id, REPROCESSABLE_STATUSES, stale_after=Config.OCR_CLAIM_TIMEOUT):
+        return jsonify({'error': 'Document is already being processed'}), 409
+    
+    # Reprocessing exists to get a fresh read, so skip the result cache
+    return ocr_response(document_id, file_path, file_type, use_cache=False)
 
 @bp.route('/process/<int:document_id>', methods=['POST'])
 def process_document(document_id):
     """Process an already uploaded document with Ollama OCR"""
-    try:
-        document = Document.query.get_or_404(document_id)
-        
-        # Process with Ollama OCR
-        if document.file_type == 'pdf':
-            ocr_result = ocr_service.process_pdf(document.file_path)
-        else:
-            ocr_result = ocr_service.process_image(document.file_path)
-        
-        # Save OCR result
-        ocr_record = OCRResult(
-            document_id=document.id,
-            extracted_text=ocr_result['extracted_text'],
-            confidence_score=ocr_result['confidence_score'],
-            processing_time=ocr_result['processing_time'],
-            drug_name=ocr_result.get('drug_name'),
-            batch_number=ocr_result.get('batch_number'),
-            expiry_date=ocr_result.get('expiry_date'),
-            manufacturer=ocr_result.get('manufacturer'),
-            controlled_substance=ocr_result.get('controlled_substance', False),
-            ocr_engine='ollama',
-            model_name=ocr_result.get('model_name'),
-            pages_processed=ocr_result.get('pages_processed')
-        )
-        db.session.add(ocr_record)
-        document.status = 'completed'
-        db.session.commit()
-        
-        return jsonify({
-            'success': True,
-            'data': ocr_record.to_dict()
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    return reprocess_document(document_id)
+
+@bp.route('/process/<int:document_id>/async', methods=['POST'])
+def process_document_async(document_id):
+    """Queue an already uploaded document for OCR on a background worker"""
+    Document.query.get_or_404(document_id, description='Document not found')
+    if not Document.claim(document_id, ('completed', 'failed'), to_status='pending', stale_after=Config.OCR_CLAIM_TIMEOUT):
+        return jsonify({'error': 'Document is already queued or being processed'}), 409
+    invalidate_analytics_cache()
+    
+    task = process_document_task.delay(document_id, use_cache=False)
+    
+    return jsonify({
+        'success': True,
+        'document_id': document_id,
+        'task_id': task.id,
+        'status_url': f'{bp.url_prefix}/tasks/{task.id}'
+    }), 202
 
 @bp.route('/results/<int:result_id>', methods=['GET'])
 def get_ocr_result(result_id):
     """Get OCR result by ID"""
-    try:
-        ocr_result = OCRResult.query.get_or_404(result_id)
-        return jsonify({
-            'success': True,
-            'data': ocr_result.to_dict()
-        }), 200
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    ocr_result = OCRResult.query.options(undefer(OCRResult.extracted_text)).get_or_404(result_id, description='OCR result not found')
+    return jsonify({
+        'success': True,
+        'data': ocr_result.to_dict()
+    }), 200
+
+def save_compliance_checks(checks_by_result):
+    """
+    Insert compliance checks for one or more OCR results in a single multi-row INSERT
+    
+    Also stores each result's compliance score and updates the daily trend
+    rollup in the same transaction. Does not commit.
+    
+    Args:
+        checks_by_result: Mapping of OCR result ID to its list of check dicts
+        
+    Returns:
+        Mapping of OCR result ID to its compliance score
+    """
+    checked_date = datetime.utcnow()
+    rows = [
+        {
+            'ocr_result_id': result_id,
+            'check_type': check['check_type'],
+            'status': check['status'],
+            'message': check['message'],
+            'severity': check['severity'],
+            'checked_date': checked_date
+        }
+        for result_id, checks in checks_by_result.items()
+        for check in checks
+    ]
+    if rows:
+        db.session.execute(insert(ComplianceCheck), rows)
+        ComplianceDailyRollup.increment(
+            checked_date.date(), Counter(row['status'] for row in rows)
+        )
+    
+    scores = {
+        result_id: compliance_service.calculate_compliance_score(checks)
+        for result_id, checks in checks_by_result.items()
+    }
+    if scores:
+        # Bulk UPDATE by primary key, batched into one executemany
+        db.session.execute(update(OCRResult), [
+            {'id': result_id, 'compliance_score': score}
+            for result_id, score in scores.items()
+        ])
+    return scores
+
+@bp.route('/results/batch_validate', methods=['POST'])
+def batch_validate_results():
+    """Validate many OCR results for compliance with one SELECT and one INSERT"""
+    result_ids = (request.get_json(silent=True) or {}).get('result_ids')
+    if not isinstance(result_ids, list) or not result_ids or \
+            not all(type(result_id) is int for result_id in result_ids):  # bool is an int subclass
+        return jsonify({'error': 'result_ids must be a non-empty list of integers'}), 400
+    if len(result_ids) > BATCH_VALIDATE_MAX:
+        return jsonify({'error': f'At most {BATCH_VALIDATE_MAX} results can be validated per request'}), 400
+    
+    ocr_results = OCRResult.query.options(undefer(OCRResult.extracted_text)).filter(
+        OCRResult.id.in_(result_ids)
+    ).all()
+    
+    # Run compliance checks in memory, then persist them all at once
+    checks_by_result = {
+        ocr_result.id: compliance_service.validate_ocr_result(ocr_result.to_dict())
+        for ocr_result in ocr_results
+    }
+    scores = save_compliance_checks(checks_by_result)
+    db.session.commit()
+    invalidate_analytics_cache()
+    
+    return jsonify({
+        'success': True,
+        'results': [
+            {
+                'result_id': result_id,
+                'compliance_score': scores[result_id],
+                'checks': checks
+            }
+            for result_id, checks in checks_by_result.items()
+        ],
+        'missing': sorted(set(result_ids) - checks_by_result.keys())
+    }), 200
 
 @bp.route('/results/<int:result_id>/validate', methods=['POST'])
 def validate_result(result_id):
     """Validate OCR result for compliance"""
-    try:
-        ocr_result = OCRResult.query.get_or_404(result_id)
-        
-        # Run compliance checks
-        ocr_data = ocr_result.to_dict()
-        compliance_checks = compliance_service.validate_ocr_result(ocr_data)
-        
-        # Save compliance checks to database
-        from models.database import ComplianceCheck
-        for check in compliance_checks:
-            compliance_record = ComplianceCheck(
-                ocr_result_id=ocr_result.id,
-                check_type=check['check_type'],
-                status=check['status'],
-                message=check['message'],
-                severity=check['severity']
-            )
-            db.session.add(compliance_record)
-        
-        db.session.commit()
-        
-        # Calculate compliance score
-        compliance_score = compliance_service.calculate_compliance_score(compliance_checks)
-        
-        return jsonify({
-            'success': True,
-            'compliance_score': compliance_score,
-            'checks': compliance_checks
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    ocr_result = OCRResult.query.options(undefer(OCRResult.extracted_text)).get_or_404(result_id, description='OCR result not found')
+    
+    # Run compliance checks
+    ocr_data = ocr_result.to_dict()
+    compliance_checks = compliance_service.validate_ocr_result(ocr_data)
+    
+    # Save compliance checks and the score in a single transaction
+    compliance_score = save_compliance_checks({result_id: compliance_checks})[result_id]
+    
+    db.session.commit()
+    invalidate_analytics_cache()
+    
+    return jsonify({
+        'success': True,
+        'compliance_score': compliance_score,
+        'checks': compliance_checks
+    }), 200
 
 @bp.route('/results/<int:result_id>/errors', methods=['GET'])
 def detect_errors(result_id):
     """Detect errors in OCR result"""
-    try:
-        ocr_result = OCRResult.query.get_or_404(result_id)
-        
-        # Detect errors
-        ocr_data = ocr_result.to_dict()
-        errors = error_service.detect_errors(ocr_data)
-        
-        # Save errors to database
-        from models.database import ErrorDetection
-        for error in errors:
-            error_record = ErrorDetection(
-                ocr_result_id=ocr_result.id,
-                error_type=error['error_type'],
-                field_name=error['field_name'],
-                expected_value=error.get('expected_value'),
-                actual_value=error['actual_value'],
-                confidence=error['confidence'],
-                suggestion=error.get('suggestion')
-            )
-            db.session.add(error_record)
-        
-        db.session.commit()
-        
-        # Get correction suggestions
-        suggestions = error_service.suggest_corrections(errors)
-        
-        return jsonify({
-            'success': True,
-            'errors': errors,
-            'suggestions': suggestions
-        }), 200
+    ocr_result = OCRResult.query.options(undefer(OCRResult.extracted_text)).get_or_404(result_id, description='OCR result not found')
+    
+    # Detect errors
+    ocr_data = ocr_result.to_dict()
+    errors = error_service.detect_errors(ocr_data)
+    
+    # Save errors to database in a single multi-row INSERT
+    rows = [
+        {
+            'ocr_result_id': ocr_result.id,
+            'error_type': error['error_type'],
+            'field_name': error['field_name'],
+            'expected_value': error.get('expected_value'),
+            'actual_value': error['actual_value'],
+            'confidence': error['confidence'],
+            'suggestion': error.get('suggestion')
+        }
+        for error in errors
+    ]
+    if rows:
+        db.session.execute(insert(ErrorDetection), rows)
+    
+    db.session.commit()
+    invalidate_analytics_cache()
+    
+    # Get correction suggestions
+    suggestions = error_service.suggest_corrections(errors)
+    
+    return jsonify({
+        'success': True,
+        'errors': errors,
+        'suggestions': suggestions
+    }), 200
+
+def encode_cursor(upload_date, document_id):
+    """Encode a (upload_date, id) position as an opaque URL-safe cursor"""
+    raw = f'{upload_date.isoformat()}|{document_id}'.encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor
+    
+    Returns:
+        Tuple of (upload_date, id)
         
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        upload_date, document_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(upload_date), int(document_id)
+    except (binascii.Error, UnicodeDecodeError) as e:
+        raise ValueError('Invalid cursor') from e
 
 @bp.route('/documents', methods=['GET'])
 def list_documents():
-    """List all documents"""
-    try:
-        documents = Document.query.order_by(Document.upload_date.desc()).all()
-        return jsonify({
-            'success': True,
-            'data': [doc.to_dict() for doc in documents]
-        }), 200
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    """List documents, newest first, one page at a time (?limit=&cursor=)"""
+    limit = min(max(request.args.get('limit', DOCUMENTS_PAGE_SIZE, type=int), 1), DOCUMENTS_MAX_PAGE_SIZE)
+    
+    # Select only the listed columns as plain rows; no ORM instances are built
+    query = select(
+        Document.id,
+        Document.filename,
+        Document.file_type,
+        Document.file_size,
+        Document.upload_date,
+        Document.status
+    ).order_by(Document.upload_date.desc(), Document.id.desc()).limit(limit + 1)
+    
+    # Seek past the previous page on the (upload_date, id) index
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            query = query.where(tuple_(Document.upload_date, Document.id) < decode_cursor(cursor))
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+    
+    rows = db.session.execute(query).all()
+    
+    # The extra row only tells us whether another page exists
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].upload_date, rows[-1].id)
+    
+    return jsonify({
+        'success': True,
+        'data': [row._asdict() for row in rows],
+        'next_cursor': next_cursor
+    }), 200
+
+@bp.route('/documents/scores', methods=['GET'])
+def list_document_scores():
+    """List the stored compliance score of every validated OCR result"""
+    rows = db.session.execute(
+        select(
+            OCRResult.document_id,
+            OCRResult.id.label('ocr_result_id'),
+            OCRResult.compliance_score
+        ).where(
+            OCRResult.compliance_score.is_not(None)
+        ).order_by(OCRResult.document_id, OCRResult.id)
+    ).all()
+    
+    return jsonify({
+        'success': True,
+        'data': [row._asdict() for row in rows]
+    }), 200
+
+@bp.route('/documents/<int:document_id>', methods=['GET'])
+def get_document(document_id):
+    """Get a document's processing status and its OCR results"""
+    document = Document.query.get_or_404(document_id, description='Document not found')
+    results = OCRResult.query.filter_by(document_id=document_id).order_by(
+        OCRResult.processed_date.desc()
+    ).all()
+    return jsonify({
+        'success': True,
+        'data': {
+            **document.to_dict(),
+            'results': [result.to_summary_dict() for result in results]
+        }
+    }), 200
 
 @bp.route('/documents/<int:document_id>', methods=['DELETE'])
 def delete_document(document_id):
     """Delete a document and its results"""
-    try:
-        document = Document.query.get_or_404(document_id)
-        
-        # Delete file
-        if os.path.exists(document.file_path):
-            os.remove(document.file_path)
-        
-        # Delete from database (cascade will handle related records)
-        db.session.delete(document)
-        db.session.commit()
-        
-        return jsonify({
-            'success': True,
-            'message': 'Document deleted successfully'
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    document = Document.query.get_or_404(document_id, description='Document not found')
+    
+    # Delete file unless another document shares the same content
+    shared = db.session.query(Document.id).filter(
+        Document.file_path == document.file_path,
+        Document.id != document_id
+    ).first()
+    if shared is None and os.path.exists(document.file_path):
+        os.remove(document.file_path)
+    
+    # Take the document's compliance checks back out of the daily rollup
+    removed = db.session.query(
+        func.date(ComplianceCheck.checked_date, type_=db.Date),
+        ComplianceCheck.status,
+        func.count(ComplianceCheck.id)
+    ).join(OCRResult).filter(
+        OCRResult.document_id == document_id
+    ).group_by(
+        func.date(ComplianceCheck.checked_date),
+        ComplianceCheck.status
+    ).all()
+    by_day = defaultdict(dict)
+    for day, status, count in removed:
+        by_day[day][status] = -count
+    for day, status_counts in by_day.items():
+        ComplianceDailyRollup.increment(day, status_counts)
+    
+    # Delete from database (cascade will handle related records)
+    db.session.delete(document)
+    db.session.commit()
+    invalidate_analytics_cache()
+    
+    return jsonify({
+        'success': True,
+        'message': 'Document deleted successfully'
+    }), 200
 
 
 # ============ MULTILINGUAL OCR ENDPOINTS (Ollama Native Support) ============
@@ -267,124 +684,23 @@ def delete_document(document_id):
 @bp.route('/multilingual/upload', methods=['POST'])
 def upload_multilingual():
     """Upload and process a document with Ollama (native multilingual support)"""
-    try:
-        if 'file' not in request.files:
-            return jsonify({'error': 'No file provided'}), 400
-        
-        file = request.files['file']
-        
-        if file.filename == '':
-            return jsonify({'error': 'No file selected'}), 400
-        
-        if not allowed_file(file.filename):
-            return jsonify({'error': 'Invalid file type'}), 400
-        
-        # Save file
-        filename = secure_filename(file.filename)
-        file_path = os.path.join('uploads', filename)
-        file.save(file_path)
-        
-        # Create document record
-        document = Document(
-            filename=filename,
-            file_path=file_path,
-            file_type=filename.rsplit('.', 1)[1].lower(),
-            file_size=os.path.getsize(file_path),
-            status='processing'
-        )
-        db.session.add(document)
-        db.session.commit()
-        
-        # Process with Ollama (handles multilingual natively)
-        try:
-            if document.file_type == 'pdf':
-                ocr_result = ocr_service.process_pdf(file_path)
-            else:
-                ocr_result = ocr_service.process_image(file_path)
-            
-            # Save OCR result
-            ocr_record = OCRResult(
-                document_id=document.id,
-                extracted_text=ocr_result['extracted_text'],
-                confidence_score=ocr_result['confidence_score'],
-                processing_time=ocr_result['processing_time'],
-                drug_name=ocr_result.get('drug_name'),
-                batch_number=ocr_result.get('batch_number'),
-                expiry_date=ocr_result.get('expiry_date'),
-                manufacturer=ocr_result.get('manufacturer'),
-                controlled_substance=ocr_result.get('controlled_substance', False),
-                ocr_engine='ollama',
-                model_name=ocr_result.get('model_name'),
-                pages_processed=ocr_result.get('pages_processed')
-            )
-            db.session.add(ocr_record)
-            
-            # Update document status
-            document.status = 'completed'
-            db.session.commit()
-            
-            return jsonify({
-                'success': True,
-                'document_id': document.id,
-                'ocr_result_id': ocr_record.id,
-                'data': ocr_record.to_dict()
-            }), 200
-            
-        except Exception as e:
-            document.status = 'failed'
-            db.session.commit()
-            return jsonify({'error': f'Ollama OCR processing failed: {str(e)}'}), 500
-    
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    return process_upload()
+
+@bp.route('/multilingual/upload/async', methods=['POST'])
+def upload_multilingual_async():
+    """Upload a document and queue it for Ollama OCR (native multilingual support)"""
+    return queue_upload(queue=MULTILINGUAL_OCR_QUEUE)
 
 @bp.route('/multilingual/process/<int:document_id>', methods=['POST'])
 def process_multilingual(document_id):
     """Process an already uploaded document with Ollama (native multilingual support)"""
-    try:
-        document = Document.query.get_or_404(document_id)
-        
-        # Process with Ollama (handles multilingual natively)
-        if document.file_type == 'pdf':
-            ocr_result = ocr_service.process_pdf(document.file_path)
-        else:
-            ocr_result = ocr_service.process_image(document.file_path)
-        
-        # Save OCR result
-        ocr_record = OCRResult(
-            document_id=document.id,
-            extracted_text=ocr_result['extracted_text'],
-            confidence_score=ocr_result['confidence_score'],
-            processing_time=ocr_result['processing_time'],
-            drug_name=ocr_result.get('drug_name'),
-            batch_number=ocr_result.get('batch_number'),
-            expiry_date=ocr_result.get('expiry_date'),
-            manufacturer=ocr_result.get('manufacturer'),
-            controlled_substance=ocr_result.get('controlled_substance', False),
-            ocr_engine='ollama',
-            model_name=ocr_result.get('model_name'),
-            pages_processed=ocr_result.get('pages_processed')
-        )
-        db.session.add(ocr_record)
-        document.status = 'completed'
-        db.session.commit()
-        
-        return jsonify({
-            'success': True,
-            'data': ocr_record.to_dict()
-        }), 200
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    return reprocess_document(document_id)
 
 @bp.route('/multilingual/languages', methods=['GET'])
 def get_supported_languages():
     """Get list of supported languages for Ollama OCR"""
-    try:
-        languages = ocr_service.get_supported_languages()
-        return jsonify({
-            'success': True,
-            'supported_languages': languages
-        }), 200
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    languages = ocr_service.get_supported_languages()
+    return jsonify({
+        'success': True,
+        'supported_languages': languages
+    }), 200
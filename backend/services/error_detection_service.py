@@ -3,15 +3,41 @@ Error Detection Service - Detects and suggests corrections for OCR errors
 """
 
 import re
-from typing import List, Dict, Any
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
 from difflib import SequenceMatcher
 
+try:
+    from rapidfuzz import fuzz, process
+    RAPIDFUZZ_AVAILABLE = True
+except ImportError:
+    RAPIDFUZZ_AVAILABLE = False
+
+# Minimum similarity for a candidate to count as a match
+MATCH_THRESHOLD = 0.6
+
+# Patterns, compiled once at import
+DOSAGE_PATTERN = re.compile(r'\d+')
+BATCH_NUMBER_PATTERN = re.compile(r'^[A-Z]{2}-\d{4}-\d{6}$')  # e.g. BN-YYYY-NNNNNN
+EXPIRY_DATE_PATTERN = re.compile(r'^\d{2}[/.-]\d{4}$')  # MM/YYYY, MM-YYYY or MM.YYYY
+SUSPICIOUS_PATTERNS = (
+    (re.compile(r'\b[O0]{2,}\b'), 'Possible confusion between O and 0'),
+    (re.compile(r'\b[I1]{2,}\b'), 'Possible confusion between I and 1'),
+    (re.compile(r'[A-Z]{10,}'), 'Unusually long uppercase sequence'),
+)
+
 class ErrorDetectionService:
     """Service for detecting errors in OCR results"""
     
     def __init__(self):
         self.common_drugs = self._load_drug_database()
+        self.known_drugs = frozenset(self.common_drugs)
+        # Labels repeat the same products, so fuzzy matches are memoized per name
+        self._closest_drug = lru_cache(maxsize=2048)(self._match_drug_name)
         self.common_errors = self._load_common_ocr_errors()
+        # Translation tables that undo the misrecognitions in either direction
+        self._to_letters = str.maketrans({k: v for k, v in self.common_errors.items() if k.isdigit()})
+        self._to_digits = str.maketrans({k: v for k, v in self.common_errors.items() if k.isalpha()})
     
     def _load_drug_database(self) -> List[str]:
         """Load common pharmaceutical drug names"""
@@ -73,14 +99,16 @@ class ErrorDetectionService:
         errors = []
         
         # Extract just the drug name (remove dosage)
-        name_only = re.split(r'\d+', drug_name)[0].strip().upper()
+        name_only = DOSAGE_PATTERN.split(drug_name, 1)[0].strip().upper()
+        
+        # Correctly read names need no fuzzy matching
+        if name_only in self.known_drugs:
+            return errors
         
         # Check if it matches known drugs
-        best_match = self._find_closest_match(name_only, self.common_drugs)
+        best_match, similarity = self._closest_drug(name_only)
         
         if best_match and best_match != name_only:
-            similarity = self._calculate_similarity(name_only, best_match)
-            
             if similarity > 0.7:  # Potential typo
                 errors.append({
                     'error_type': 'spelling',
@@ -98,32 +126,49 @@ class ErrorDetectionService:
         errors = []
         
         # Expected format: BN-YYYY-NNNNNN
-        if not re.match(r'^[A-Z]{2}-\d{4}-\d{6}$', batch_number):
+        if not BATCH_NUMBER_PATTERN.match(batch_number):
+            corrected = self._correct_batch_number(batch_number)
             errors.append({
                 'error_type': 'format',
                 'field_name': 'batch_number',
                 'actual_value': batch_number,
-                'expected_value': 'BN-YYYY-NNNNNN',
+                'expected_value': corrected or 'BN-YYYY-NNNNNN',
                 'confidence': 0.9,
-                'suggestion': 'Batch number should follow format: BN-YYYY-NNNNNN'
+                'suggestion': f"Did you mean '{corrected}'?" if corrected
+                    else 'Batch number should follow format: BN-YYYY-NNNNNN'
             })
         
         return errors
     
+    def _correct_batch_number(self, batch_number: str) -> Optional[str]:
+        """
+        Repair a batch number garbled by common OCR misrecognitions
+        
+        Drops stray whitespace, then maps digits to letters in the prefix and
+        letters to digits in the numeric parts (e.g. 'BN-2O24-00I234').
+        
+        Args:
+            batch_number: Batch number that failed the format check
+            
+        Returns:
+            The corrected batch number, or None if it cannot be repaired
+        """
+        compact = ''.join(batch_number.split()).upper()
+        if len(compact) != 14 or compact[2] != '-' or compact[7] != '-':
+            return None
+        
+        corrected = '-'.join((
+            compact[:2].translate(self._to_letters),
+            compact[3:7].translate(self._to_digits),
+            compact[8:].translate(self._to_digits)
+        ))
+        return corrected if BATCH_NUMBER_PATTERN.match(corrected) else None
+    
     def _check_expiry_date(self, expiry_date: str) -> List[Dict[str, Any]]:
         """Check expiry date for format errors"""
         errors = []
         
-        # Common date formats: MM/YYYY, MM-YYYY, MM.YYYY
-        valid_formats = [
-            r'^\d{2}/\d{4}$',
-            r'^\d{2}-\d{4}$',
-            r'^\d{2}\.\d{4}$'
-        ]
-        
-        is_valid = any(re.match(pattern, expiry_date) for pattern in valid_formats)
-        
-        if not is_valid:
+        if not EXPIRY_DATE_PATTERN.match(expiry_date):
             errors.append({
                 'error_type': 'format',
                 'field_name': 'expiry_date',
@@ -140,15 +185,8 @@ class ErrorDetectionService:
         errors = []
         
         # Check for suspicious patterns
-        suspicious_patterns = [
-            (r'\b[O0]{2,}\b', 'Possible confusion between O and 0'),
-            (r'\b[I1]{2,}\b', 'Possible confusion between I and 1'),
-            (r'[A-Z]{10,}', 'Unusually long uppercase sequence'),
-        ]
-        
-        for pattern, message in suspicious_patterns:
-            matches = re.finditer(pattern, text)
-            for match in matches:
+        for pattern, message in SUSPICIOUS_PATTERNS:
+            for match in pattern.finditer(text):
                 errors.append({
                     'error_type': 'character_confusion',
                     'field_name': 'extracted_text',
@@ -160,25 +198,55 @@ class ErrorDetectionService:
         
         return errors
     
-    def _find_closest_match(self, text: str, candidates: List[str]) -> str:
-        """Find the closest matching string from candidates"""
+    def _match_drug_name(self, name: str) -> Tuple[Optional[str], float]:
+        """Find the closest known drug name; memoized as _closest_drug"""
+        return self._find_closest_match(name, self.common_drugs)
+    
+    def _find_closest_match(self, text: str, candidates: List[str]) -> Tuple[Optional[str], float]:
+        """
+        Find the closest matching string from candidates
+        
+        Uses rapidfuzz's C++ matcher when installed, scoring with the same
+        normalized ratio as SequenceMatcher. Candidates are compared as given
+        (the drug database is upper case).
+        
+        Args:
+            text: String to match
+            candidates: Strings to match against
+            
+        Returns:
+            Tuple of (best match or None, similarity 0-1)
+        """
         if not candidates:
-            return None
+            return None, 0.0
+        
+        text = text.upper()
+        if RAPIDFUZZ_AVAILABLE:
+            match = process.extractOne(text, candidates, scorer=fuzz.ratio, score_cutoff=MATCH_THRESHOLD * 100)
+            if match is None:
+                return None, 0.0
+            similarity = match[1] / 100.0
+            return (match[0], similarity) if similarity > MATCH_THRESHOLD else (None, 0.0)
         
         best_match = None
         best_ratio = 0
         
+        # SequenceMatcher indexes its second sequence, so fix the query there
+        # once and swap candidates in as the first
+        matcher = SequenceMatcher(None, b=text, autojunk=False)
+        text_length = len(text)
         for candidate in candidates:
-            ratio = self._calculate_similarity(text, candidate)
+            # The ratio is at most 2 * shorter / total length; skip candidates
+            # whose length alone rules out passing the threshold
+            if 2 * min(len(candidate), text_length) <= MATCH_THRESHOLD * (len(candidate) + text_length):
+                continue
+            matcher.set_seq1(candidate)
+            ratio = matcher.ratio()
             if ratio > best_ratio:
                 best_ratio = ratio
                 best_match = candidate
         
-        return best_match if best_ratio > 0.6 else None
-    
-    def _calculate_similarity(self, str1: str, str2: str) -> float:
-        """Calculate similarity ratio between two strings"""
-        return SequenceMatcher(None, str1.upper(), str2.upper()).ratio()
+        return (best_match, best_ratio) if best_ratio > MATCH_THRESHOLD else (None, 0.0)
     
     def suggest_corrections(self, errors: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
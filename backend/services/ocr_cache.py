@@ -0,0 +1,104 @@
+"""
+OCR Cache - Persistent content-addressed cache for OCR results
+"""
+
+import os
+import mmap
+import hashlib
+import logging
+import threading
+from functools import wraps
+from typing import Any, Callable, Dict
+
+from diskcache import Cache
+
+from config import Config
+
+try:
+    import blake3
+    BLAKE3_AVAILABLE = True
+except ImportError:
+    BLAKE3_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Evict least-recently-stored entries beyond this size (default 5 GiB)
+CACHE_SIZE_LIMIT = Config.OCR_CACHE_SIZE_LIMIT
+
+_caches: Dict[str, Cache] = {}
+_caches_lock = threading.Lock()
+
+
+def file_digest(file_path: str) -> str:
+    """
+    Hash the contents of a file
+    
+    Args:
+        file_path: Path to the file
+        
+    Returns:
+        Hex digest (BLAKE3 if installed, SHA-256 otherwise)
+    """
+    hasher = blake3.blake3() if BLAKE3_AVAILABLE else hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return hasher.hexdigest()
+        # Hash through a read-only mapping so the bytes are not copied into Python
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            hasher.update(mm)
+    return hasher.hexdigest()
+
+
+def get_cache(cache_dir: str) -> Cache:
+    """Open (once per process) the disk cache stored in cache_dir"""
+    with _caches_lock:
+        if cache_dir not in _caches:
+            _caches[cache_dir] = Cache(cache_dir, size_limit=CACHE_SIZE_LIMIT)
+        return _caches[cache_dir]
+
+
+def cache_key(service: Any, digest: str) -> str:
+    """
+    Build the cache key for a service and file digest
+    
+    The key embeds the engine and its version, so upgrading Tesseract or
+    switching the Ollama model never serves results from the old engine.
+    """
+    version = service.engine_version() if hasattr(service, 'engine_version') else ''
+    return f"{service.__class__.__name__}:{version}:{digest}"
+
+
+def cached_ocr(fn: Callable) -> Callable:
+    """
+    Cache an OCR method's result by the content hash of its input file
+    
+    The wrapped method must take the file path as its first argument. Caching
+    is enabled per service instance by setting its `cache_dir` attribute.
+    Pass `use_cache=False` to skip the lookup and refresh the stored entry.
+    Results without any extracted text are never stored.
+    """
+    @wraps(fn)
+    def wrapper(self, file_path: str, *args, use_cache: bool = True, **kwargs):
+        cache_dir = getattr(self, 'cache_dir', None)
+        if not cache_dir:
+            return fn(self, file_path, *args, **kwargs)
+        
+        try:
+            key = cache_key(self, file_digest(file_path))
+        except OSError:
+            return fn(self, file_path, *args, **kwargs)
+        
+        cache = get_cache(cache_dir)
+        if use_cache:
+            cached = cache.get(key)
+            if cached is not None:
+                logger.debug("OCR cache hit for %s", file_path)
+                return cached
+        
+        result = fn(self, file_path, *args, **kwargs)
+        # Blank text usually means the backend failed quietly; keep it retryable
+        if result.get('extracted_text', '').strip():
+            cache.set(key, result)
+        return result
+    
+    return wrapper
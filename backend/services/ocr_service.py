@@ -3,9 +3,14 @@ OCR Service - Main OCR processing logic using Tesseract OCR
 """
 
 import time
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, Tuple, Optional
 import re
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from services.ocr_cache import cached_ocr
+from services.pdf_renderer import render_pdf_pages
 try:
     import pytesseract
     from PIL import Image
@@ -16,28 +21,66 @@ except ImportError:
     TESSERACT_AVAILABLE = False
     print("Warning: Tesseract dependencies not installed. Install with: pip install pytesseract pillow opencv-python")
 
+# Pharmaceutical field patterns, compiled once at import
+FIELD_PATTERNS = {
+    'drug_name': re.compile(r'Drug Name:\s*([^\n]+)', re.IGNORECASE),
+    'batch_number': re.compile(r'Batch Number:\s*([^\n]+)', re.IGNORECASE),
+    'expiry_date': re.compile(r'Expiry Date:\s*([^\n]+)', re.IGNORECASE),
+    'manufacturer': re.compile(r'Manufacturer:\s*([^\n]+)', re.IGNORECASE),
+}
+CONTROLLED_SUBSTANCE_PATTERN = re.compile(r'controlled\s+substance|schedule\s+[I-V]+', re.IGNORECASE)
+
+# Tesseract subprocesses run side by side (one per core), so keep each one
+# single-threaded; OpenMP threads inside parallel runs oversubscribe the CPU.
+# Set OMP_THREAD_LIMIT explicitly to override.
+os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+
+# Bounds concurrent Tesseract subprocesses across all threads in this process
+OCR_MAX_CONCURRENCY = Config.OCR_MAX_CONCURRENCY
+OCR_SEMAPHORE = threading.BoundedSemaphore(OCR_MAX_CONCURRENCY)
+
 class OCRService:
     """Service for OCR processing using Tesseract"""
     
-    def __init__(self, tesseract_cmd=None):
+    def __init__(self, tesseract_cmd=None, cache_dir: Optional[str] = None):
         """
         Initialize OCR service with Tesseract
         
         Args:
             tesseract_cmd: Path to tesseract executable (optional)
+            cache_dir: Directory for cached OCR results keyed by file hash (disabled if None)
         """
         if not TESSERACT_AVAILABLE:
             raise ImportError("Tesseract dependencies not installed")
         
+        self.cache_dir = cache_dir
+        self._engine_version = None
+        
         # Set Tesseract command path if provided
         if tesseract_cmd:
             pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
-        elif os.getenv('TESSERACT_CMD'):
-            pytesseract.pytesseract.tesseract_cmd = os.getenv('TESSERACT_CMD')
+        elif Config.TESSERACT_CMD:
+            pytesseract.pytesseract.tesseract_cmd = Config.TESSERACT_CMD
         
         # Tesseract configuration for better accuracy
         self.config = '--oem 3 --psm 6'  # LSTM OCR Engine, Assume uniform block of text
     
+    def engine_version(self) -> str:
+        """
+        Identify the engine build for cache keys
+        
+        Returns:
+            Tesseract version plus the config flags (queried once per instance)
+        """
+        if self._engine_version is None:
+            try:
+                version = pytesseract.get_tesseract_version()
+            except Exception:
+                version = 'unknown'
+            self._engine_version = f"tesseract-{version}"
+        return f"{self._engine_version}:{self.config}"
+    
+    @cached_ocr
     def process_image(self, image_path: str) -> Dict[str, Any]:
         """
         Process an image and extract text using Tesseract OCR
@@ -55,10 +98,11 @@ class OCRService:
             preprocessed_image = self._preprocess_image(image_path)
             
             # Extract text using Tesseract
-            extracted_text = pytesseract.image_to_string(
-                preprocessed_image,
-                config=self.config
-            )
+            with OCR_SEMAPHORE:
+                extracted_text = pytesseract.image_to_string(
+                    preprocessed_image,
+                    config=self.config
+                )
             
             # Get confidence scores
             confidence_score = self._calculate_confidence(preprocessed_image)
@@ -78,6 +122,7 @@ class OCRService:
         except Exception as e:
             raise Exception(f"OCR processing failed: {str(e)}")
     
+    @cached_ocr
     def process_pdf(self, pdf_path: str) -> Dict[str, Any]:
         """
         Process a PDF document and extract text using Tesseract
@@ -91,57 +136,19 @@ class OCRService:
         start_time = time.time()
         
         try:
-            from pdf2image import convert_from_path
-            
-            # Determine poppler path based on OS
-            poppler_path = None
-            import platform
-            import shutil
-            
-            if platform.system() == 'Windows':
-                # Try common Windows installation paths
-                possible_paths = [
-                    r'C:\Users\KIIT0001\Downloads\Release-25.12.0-0\poppler-25.12.0\Library\bin',
-                    r'C:\Program Files\poppler\Library\bin',
-                    r'C:\Program Files (x86)\poppler\Library\bin',
-                    os.getenv('POPPLER_PATH')  # Check environment variable
-                ]
-                for path in possible_paths:
-                    if path and os.path.exists(path):
-                        poppler_path = path
-                        break
-                
-                # If still not found, try to find pdftoppm in PATH
-                if not poppler_path:
-                    pdftoppm_path = shutil.which('pdftoppm')
-                    if pdftoppm_path:
-                        poppler_path = os.path.dirname(pdftoppm_path)
-            
             # Convert PDF to images
-            if poppler_path:
-                images = convert_from_path(pdf_path, dpi=300, poppler_path=poppler_path)
+            images = render_pdf_pages(pdf_path, dpi=300)
+            
+            # Pages are independent; Tesseract runs as a subprocess and OpenCV
+            # releases the GIL, so threads overlap them (capped by OCR_SEMAPHORE)
+            if len(images) > 1:
+                with ThreadPoolExecutor(max_workers=min(len(images), OCR_MAX_CONCURRENCY)) as pool:
+                    pages = list(pool.map(self._process_page, images))
             else:
-                images = convert_from_path(pdf_path, dpi=300)
-            
-            all_text = []
-            total_confidence = 0
-            
-            # Process each page
-            for i, image in enumerate(images):
-                # Convert PIL Image to numpy array for preprocessing
-                img_array = np.array(image)
-                preprocessed = self._preprocess_image_array(img_array)
-                
-                # Extract text
-                page_text = pytesseract.image_to_string(
-                    preprocessed,
-                    config=self.config
-                )
-                all_text.append(page_text)
-                
-                # Calculate confidence for this page
-                page_confidence = self._calculate_confidence(preprocessed)
-                total_confidence += page_confidence
+                pages = [self._process_page(image) for image in images]
+            
+            all_text = [page_text for page_text, _ in pages]
+            total_confidence = sum(page_confidence for _, page_confidence in pages)
             
             # Combine all pages
             extracted_text = "\n\n--- Page Break ---\n\n".join(all_text)
@@ -159,7 +166,7 @@ class OCRService:
             }
             
         except ImportError:
-            raise Exception("pdf2image not installed. Install with: pip install pdf2image")
+            raise Exception("No PDF renderer installed. Install with: pip install pypdfium2")
         except Exception as e:
             error_msg = str(e)
             if "poppler" in error_msg.lower():
@@ -173,6 +180,26 @@ class OCRService:
                 )
             raise Exception(f"PDF processing failed: {error_msg}")
     
+    def _process_page(self, image) -> Tuple[str, float]:
+        """
+        OCR one rendered PDF page
+        
+        Args:
+            image: PIL image of the page
+            
+        Returns:
+            Tuple of (page text, page confidence)
+        """
+        preprocessed = self._preprocess_image_array(np.array(image))
+        
+        with OCR_SEMAPHORE:
+            page_text = pytesseract.image_to_string(
+                preprocessed,
+                config=self.config
+            )
+        
+        return page_text, self._calculate_confidence(preprocessed)
+    
     def _preprocess_image(self, image_path: str):
         """
         Preprocess image for better OCR accuracy
@@ -239,11 +266,12 @@ class OCRService:
         """
         try:
             # Get detailed OCR data with confidence scores
-            data = pytesseract.image_to_data(
-                image,
-                config=self.config,
-                output_type=pytesseract.Output.DICT
-            )
+            with OCR_SEMAPHORE:
+                data = pytesseract.image_to_data(
+                    image,
+                    config=self.config,
+                    output_type=pytesseract.Output.DICT
+                )
             
             # Calculate average confidence for words with confidence > 0
             confidences = [
@@ -294,28 +322,14 @@ class OCRService:
             'controlled_substance': False
         }
         
-        # Extract drug name
-        drug_match = re.search(r'Drug Name:\s*([^\n]+)', text, re.IGNORECASE)
-        if drug_match:
-            data['drug_name'] = drug_match.group(1).strip()
-        
-        # Extract batch number
-        batch_match = re.search(r'Batch Number:\s*([^\n]+)', text, re.IGNORECASE)
-        if batch_match:
-            data['batch_number'] = batch_match.group(1).strip()
-        
-        # Extract expiry date
-        expiry_match = re.search(r'Expiry Date:\s*([^\n]+)', text, re.IGNORECASE)
-        if expiry_match:
-            data['expiry_date'] = expiry_match.group(1).strip()
-        
-        # Extract manufacturer
-        mfr_match = re.search(r'Manufacturer:\s*([^\n]+)', text, re.IGNORECASE)
-        if mfr_match:
-            data['manufacturer'] = mfr_match.group(1).strip()
+        # Extract labelled fields
+        for field, pattern in FIELD_PATTERNS.items():
+            match = pattern.search(text)
+            if match:
+                data[field] = match.group(1).strip()
         
         # Check for controlled substance
-        if re.search(r'controlled\s+substance|schedule\s+[I-V]+', text, re.IGNORECASE):
+        if CONTROLLED_SUBSTANCE_PATTERN.search(text):
             data['controlled_substance'] = True
         
         return data
@@ -343,15 +357,16 @@ class OCRService:
 class TesseractOCRService(OCRService):
     """Tesseract OCR implementation with advanced features"""
     
-    def __init__(self, tesseract_cmd: str = None, lang: str = 'eng'):
+    def __init__(self, tesseract_cmd: str = None, lang: str = 'eng', cache_dir: Optional[str] = None):
         """
         Initialize Tesseract OCR service
         
         Args:
             tesseract_cmd: Path to tesseract executable
             lang: Language code (default: 'eng' for English)
+            cache_dir: Directory for cached OCR results keyed by file hash (disabled if None)
         """
-        super().__init__(tesseract_cmd)
+        super().__init__(tesseract_cmd, cache_dir=cache_dir)
         self.lang = lang
         # Enhanced config for pharmaceutical documents
         self.config = f'--oem 3 --psm 6 -l {lang}'
@@ -370,17 +385,19 @@ class TesseractOCRService(OCRService):
             preprocessed = self._preprocess_image(image_path)
             
             # Get detailed layout information
-            data = pytesseract.image_to_data(
-                preprocessed,
-                config=self.config,
-                output_type=pytesseract.Output.DICT
-            )
+            with OCR_SEMAPHORE:
+                data = pytesseract.image_to_data(
+                    preprocessed,
+                    config=self.config,
+                    output_type=pytesseract.Output.DICT
+                )
             
             # Extract structured data
             structured_data = self._extract_structured_data(data)
             
             # Get full text
-            full_text = pytesseract.image_to_string(preprocessed, config=self.config)
+            with OCR_SEMAPHORE:
+                full_text = pytesseract.image_to_string(preprocessed, config=self.config)
             
             return {
                 'extracted_text': full_text,
@@ -2,12 +2,21 @@
 Ollama OCR Service - OCR processing using Ollama vision models
 """
 
+import re
+import mmap
 import time
 import base64
 import requests
 import logging
-from typing import Dict, Any, Optional
-import os
+from types import MappingProxyType
+from typing import Dict, Any, List, Optional
+from config import Config
+from interfaces import OCRServiceInterface
+from services.retry import ocr_retry, RateLimitError
+from services.ocr_cache import cached_ocr
+from services.pdf_renderer import render_pdf_pages
+
+logger = logging.getLogger(__name__)
 
 try:
     import cv2
@@ -16,15 +25,79 @@ try:
     OPENCV_AVAILABLE = True
 except ImportError:
     OPENCV_AVAILABLE = False
-    print("Warning: OpenCV/PIL not available. Image preprocessing will be limited.")
+    logger.warning("OpenCV/PIL not available. Image preprocessing will be limited.")
 
-logger = logging.getLogger(__name__)
+# Pharmaceutical field patterns, compiled once at import and tried in order
+DRUG_PATTERNS = [
+    re.compile(r'(?:Drug|Medication|Active Ingredient):\s*([A-Za-z\s\-]+)', re.MULTILINE),
+    re.compile(r'^([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\s*(?:Tablet|Capsule|Injection)', re.MULTILINE),
+]
+BATCH_PATTERNS = [
+    re.compile(r'(?:Batch|Lot)\s*(?:No|Number|#)?:?\s*([A-Z0-9\-]+)', re.IGNORECASE),
+    re.compile(r'Batch:\s*([A-Z0-9\-]+)', re.IGNORECASE),
+]
+EXPIRY_PATTERNS = [
+    re.compile(r'(?:Expiry|Exp|Expires?)\s*(?:Date|on)?:?\s*(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})', re.IGNORECASE),
+    re.compile(r'(?:Expiry|Exp):\s*(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})', re.IGNORECASE),
+]
+MANUFACTURER_PATTERNS = [
+    re.compile(r'(?:Manufacturer|Mfg|Made by):\s*([A-Za-z\s\&\.\,]+?)(?:\n|$)', re.IGNORECASE),
+    re.compile(r'(?:Manufactured by|Mfg by):\s*([A-Za-z\s\&\.\,]+?)(?:\n|$)', re.IGNORECASE),
+]
+CONTROLLED_KEYWORDS = (
+    'controlled substance', 'schedule i', 'schedule ii', 'schedule iii',
+    'schedule iv', 'schedule v', 'narcotic', 'opioid', 'benzodiazepine',
+    'amphetamine', 'barbiturate', 'stimulant'
+)
+
+# num_gpu value that offloads every model layer to the GPU (Ollama's own
+# default of -1 means "decide automatically")
+ALL_GPU_LAYERS = 999
 
+# Languages the vision model reads natively, by ISO 639-1 code; built once
+# and read-only, since it is shared by every request
+SUPPORTED_LANGUAGES = MappingProxyType({
+    # European languages
+    'en': 'English',
+    'fr': 'French',
+    'de': 'German',
+    'es': 'Spanish',
+    'it': 'Italian',
+    'pt': 'Portuguese',
+    'ru': 'Russian',
+    'nl': 'Dutch',
+    'sv': 'Swedish',
+    'pl': 'Polish',
+    'tr': 'Turkish',
+    'el': 'Greek',
+    'he': 'Hebrew',
+    'et': 'Estonian',
 
-class OllamaOCRService:
+    # Asian languages
+    'zh': 'Chinese',
+    'ja': 'Japanese',
+    'ko': 'Korean',
+    'th': 'Thai',
+
+    # Indian languages
+    'hi': 'Hindi',
+    'ta': 'Tamil',
+    'te': 'Telugu',
+    'kn': 'Kannada',
+    'ml': 'Malayalam',
+    'gu': 'Gujarati',
+    'mr': 'Marathi',
+    'bn': 'Bengali',
+    'pa': 'Punjabi',
+    'ur': 'Urdu',
+})
+
+
+class OllamaOCRService(OCRServiceInterface):
     """Service for OCR processing using Ollama vision models"""
     
-    def __init__(self, ollama_endpoint: str, model_name: str, timeout: int = 30):
+    def __init__(self, ollama_endpoint: str, model_name: str, timeout: int = 30,
+                 cache_dir: Optional[str] = None, device: str = 'auto'):
         """
         Initialize Ollama OCR service
         
@@ -32,14 +105,21 @@ class OllamaOCRService:
             ollama_endpoint: URL of Ollama server (e.g., http://localhost:11434)
             model_name: Name of the vision model to use (e.g., glm-ocr:latest)
             timeout: Request timeout in seconds (default 30)
+            cache_dir: Directory for cached OCR results keyed by file hash (disabled if None)
+            device: Inference device - 'auto', 'cpu', 'cuda' or 'cuda:<index>' (default 'auto')
         """
         self.ollama_endpoint = ollama_endpoint.rstrip('/')
         self.model_name = model_name
         self.timeout = timeout
+        self.cache_dir = cache_dir
         self.api_endpoint = f"{self.ollama_endpoint}/api/generate"
+        self.keep_alive = Config.OLLAMA_KEEP_ALIVE
+        self.device = device
+        self.model_options = self._device_options(device)
         
         logger.info(f"Initialized OllamaOCRService with endpoint: {self.ollama_endpoint}, model: {self.model_name}")
     
+    @cached_ocr
     def process_image(self, image_path: str) -> Dict[str, Any]:
         """
         Process an image and extract text using Ollama
@@ -83,6 +163,61 @@ class OllamaOCRService:
             logger.error(f"Ollama OCR processing failed for {image_path}: {str(e)}")
             raise Exception(f"Ollama OCR processing failed: {str(e)}")
     
+    def engine_version(self) -> str:
+        """Identify the engine build for cache keys (the Ollama model tag)"""
+        return f"ollama-{self.model_name}"
+    
+    def extract_text(self, image_path: str) -> Dict[str, Any]:
+        """
+        Extract text from a single image
+        
+        Args:
+            image_path: Path to the image file
+            
+        Returns:
+            Dictionary with 'success', 'text', and 'error' keys
+        """
+        try:
+            result = self.process_image(image_path)
+            return {'success': True, 'text': result['extracted_text'], 'error': None}
+        except Exception as e:
+            return {'success': False, 'text': '', 'error': str(e)}
+    
+    def extract_text_from_images(self, image_paths: List[str]) -> Dict[str, Any]:
+        """
+        Extract text from multiple images in one batch
+        
+        The model is loaded once up front and kept resident for the whole
+        batch, so pages after the first never pay Ollama's model load time.
+        
+        Args:
+            image_paths: List of paths to image files
+            
+        Returns:
+            Dictionary with 'success', 'text', 'by_page', and 'error' keys
+        """
+        if not image_paths:
+            return {'success': True, 'text': '', 'by_page': [], 'error': None}
+        
+        self._warm_up_model()
+        
+        by_page = []
+        try:
+            for image_path in image_paths:
+                image_data = base64.b64encode(self._preprocess_image(image_path)).decode('utf-8')
+                by_page.append(self._send_to_ollama(image_data))
+        except Exception as e:
+            logger.error(f"Ollama batch OCR failed at page {len(by_page) + 1}: {str(e)}")
+            return {'success': False, 'text': '', 'by_page': by_page, 'error': str(e)}
+        
+        return {
+            'success': True,
+            'text': "\n--- Page Break ---\n".join(by_page),
+            'by_page': by_page,
+            'error': None
+        }
+    
+    @cached_ocr
     def process_pdf(self, pdf_path: str) -> Dict[str, Any]:
         """
         Process a PDF document and extract text using Ollama
@@ -96,17 +231,9 @@ class OllamaOCRService:
         start_time = time.time()
         
         try:
-            from pdf2image import convert_from_path
-            import platform
-            import shutil
-            
-            # Determine poppler path based on OS
-            poppler_path = None
-            if platform.system() == 'Windows':
-                poppler_path = shutil.which('poppler')
-            
             # Convert PDF to images
-            images = convert_from_path(pdf_path, poppler_path=poppler_path)
+            images = render_pdf_pages(pdf_path)
+            render_time = time.time() - start_time
             
             if not images:
                 raise Exception("Failed to convert PDF to images")
@@ -151,6 +278,10 @@ class OllamaOCRService:
                 'ocr_engine': 'ollama',
                 'model_name': self.model_name,
                 'pages_processed': len(images),
+                'ocr_metadata': {
+                    'render_time': render_time,
+                    'inference_time': processing_time - render_time
+                },
                 **pharma_data
             }
             
@@ -158,6 +289,7 @@ class OllamaOCRService:
             logger.error(f"Ollama PDF processing failed for {pdf_path}: {str(e)}")
             raise Exception(f"Ollama PDF processing failed: {str(e)}")
     
+    @ocr_retry
     def _send_to_ollama(self, image_data: str) -> str:
         """
         Send image to Ollama for text extraction
@@ -173,7 +305,9 @@ class OllamaOCRService:
                 "model": self.model_name,
                 "prompt": "Extract all text from this image. Return only the extracted text without any explanation.",
                 "images": [image_data],
-                "stream": False
+                "stream": False,
+                "keep_alive": self.keep_alive,
+                "options": self.model_options
             }
             
             response = requests.post(
@@ -182,6 +316,8 @@ class OllamaOCRService:
                 timeout=self.timeout
             )
             
+            if response.status_code == 429:
+                raise RateLimitError(f"Ollama API rate limited: {response.text}")
             if response.status_code != 200:
                 raise Exception(f"Ollama API error: {response.status_code} - {response.text}")
             
@@ -193,6 +329,8 @@ class OllamaOCRService:
             
             return extracted_text
             
+        except RateLimitError:
+            raise
         except requests.Timeout:
             logger.error(f"Ollama request timeout after {self.timeout} seconds")
             raise Exception(f"Ollama request timeout after {self.timeout} seconds")
@@ -203,6 +341,46 @@ class OllamaOCRService:
             logger.error(f"Error sending image to Ollama: {str(e)}")
             raise Exception(f"Error communicating with Ollama: {str(e)}")
     
+    @staticmethod
+    def _device_options(device: str) -> Dict[str, Any]:
+        """
+        Translate a device setting into Ollama model options
+        
+        Args:
+            device: 'auto', 'cpu', 'cuda' or 'cuda:<index>'
+            
+        Returns:
+            Options dict for the generate API (empty lets Ollama decide)
+        """
+        device = (device or 'auto').lower()
+        if device == 'cpu':
+            return {'num_gpu': 0}  # keep every layer on the CPU
+        if device == 'cuda':
+            return {'num_gpu': ALL_GPU_LAYERS}
+        if device.startswith('cuda:'):
+            index = device.split(':', 1)[1]
+            if index.isdigit():
+                return {'num_gpu': ALL_GPU_LAYERS, 'main_gpu': int(index)}
+        if device != 'auto':
+            logger.warning("Unrecognized OCR device %r, letting Ollama choose", device)
+        return {}
+    
+    def _warm_up_model(self) -> None:
+        """
+        Load the model into Ollama's memory ahead of a batch
+        
+        A generate request without a prompt only loads the model, so the
+        first page of a batch is not timed against the cold start.
+        """
+        try:
+            requests.post(
+                self.api_endpoint,
+                json={"model": self.model_name, "keep_alive": self.keep_alive, "options": self.model_options},
+                timeout=self.timeout
+            )
+        except requests.RequestException as e:
+            logger.warning(f"Ollama model warm-up failed: {str(e)}")
+    
     def _calculate_confidence(self, text: str) -> float:
         """
         Calculate confidence score for extracted text
@@ -243,8 +421,6 @@ class OllamaOCRService:
         Returns:
             Dictionary containing pharmaceutical data
         """
-        import re
-        
         pharma_data = {
             'drug_name': None,
             'batch_number': None,
@@ -256,61 +432,25 @@ class OllamaOCRService:
         if not text:
             return pharma_data
         
-        # Extract drug name (common pharmaceutical naming patterns)
-        drug_patterns = [
-            r'(?:Drug|Medication|Active Ingredient):\s*([A-Za-z\s\-]+)',
-            r'^([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\s*(?:Tablet|Capsule|Injection)',
-        ]
-        for pattern in drug_patterns:
-            match = re.search(pattern, text, re.MULTILINE)
-            if match:
-                pharma_data['drug_name'] = match.group(1).strip()
-                break
-        
-        # Extract batch number
-        batch_patterns = [
-            r'(?:Batch|Lot)\s*(?:No|Number|#)?:?\s*([A-Z0-9\-]+)',
-            r'Batch:\s*([A-Z0-9\-]+)',
-        ]
-        for pattern in batch_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                pharma_data['batch_number'] = match.group(1).strip()
-                break
-        
-        # Extract expiry date
-        expiry_patterns = [
-            r'(?:Expiry|Exp|Expires?)\s*(?:Date|on)?:?\s*(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
-            r'(?:Expiry|Exp):\s*(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
-        ]
-        for pattern in expiry_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                pharma_data['expiry_date'] = match.group(1).strip()
-                break
-        
-        # Extract manufacturer
-        mfg_patterns = [
-            r'(?:Manufacturer|Mfg|Made by):\s*([A-Za-z\s\&\.\,]+?)(?:\n|$)',
-            r'(?:Manufactured by|Mfg by):\s*([A-Za-z\s\&\.\,]+?)(?:\n|$)',
-        ]
-        for pattern in mfg_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                pharma_data['manufacturer'] = match.group(1).strip()
-                break
+        # Extract labelled fields, first matching pattern wins
+        field_patterns = (
+            ('drug_name', DRUG_PATTERNS),
+            ('batch_number', BATCH_PATTERNS),
+            ('expiry_date', EXPIRY_PATTERNS),
+            ('manufacturer', MANUFACTURER_PATTERNS),
+        )
+        for field, patterns in field_patterns:
+            for pattern in patterns:
+                match = pattern.search(text)
+                if match:
+                    pharma_data[field] = match.group(1).strip()
+                    break
         
         # Detect controlled substances
-        controlled_keywords = [
-            'controlled substance', 'schedule i', 'schedule ii', 'schedule iii',
-            'schedule iv', 'schedule v', 'narcotic', 'opioid', 'benzodiazepine',
-            'amphetamine', 'barbiturate', 'stimulant'
-        ]
         text_lower = text.lower()
-        for keyword in controlled_keywords:
-            if keyword in text_lower:
-                pharma_data['controlled_substance'] = True
-                break
+        pharma_data['controlled_substance'] = any(
+            keyword in text_lower for keyword in CONTROLLED_KEYWORDS
+        )
         
         return pharma_data
     
@@ -390,19 +530,20 @@ class OllamaOCRService:
                 with open(image_path, 'rb') as f:
                     return f.read()
             
-            # Read image
-            image = cv2.imread(image_path)
-            
-            if image is None:
-                # Try with PIL if cv2 fails
-                pil_image = Image.open(image_path)
-                image = np.array(pil_image)
+            # Map the file once and decode straight from the page cache
+            with open(image_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                encoded = np.frombuffer(mm, dtype=np.uint8)
+                image = cv2.imdecode(encoded, cv2.IMREAD_COLOR)
+                del encoded  # release the buffer export before the map closes
+                
+                if image is None:
+                    # Try with PIL if cv2 fails
+                    image = np.array(Image.open(mm))
             
             # Preprocess the image array
             processed = self._preprocess_image_array(image)
             
             # Convert back to bytes
-            import io
             _, buffer = cv2.imencode('.png', processed)
             return buffer.tobytes()
             
@@ -457,40 +598,6 @@ class OllamaOCRService:
         Get list of supported languages for Ollama OCR
 
         Returns:
-            Dictionary of language codes and names
+            Dictionary of language codes and names (a copy the caller may modify)
         """
-        return {
-            # European languages
-            'en': 'English',
-            'fr': 'French',
-            'de': 'German',
-            'es': 'Spanish',
-            'it': 'Italian',
-            'pt': 'Portuguese',
-            'ru': 'Russian',
-            'nl': 'Dutch',
-            'sv': 'Swedish',
-            'pl': 'Polish',
-            'tr': 'Turkish',
-            'el': 'Greek',
-            'he': 'Hebrew',
-            'et': 'Estonian',
-
-            # Asian languages
-            'zh': 'Chinese',
-            'ja': 'Japanese',
-            'ko': 'Korean',
-            'th': 'Thai',
-
-            # Indian languages
-            'hi': 'Hindi',
-            'ta': 'Tamil',
-            'te': 'Telugu',
-            'kn': 'Kannada',
-            'ml': 'Malayalam',
-            'gu': 'Gujarati',
-            'mr': 'Marathi',
-            'bn': 'Bengali',
-            'pa': 'Punjabi',
-            'ur': 'Urdu',
-        }
+        return dict(SUPPORTED_LANGUAGES)
@@ -0,0 +1,123 @@
+"""
+PDF Renderer - Converts PDF pages to images for OCR
+"""
+
+import os
+import shutil
+import logging
+import platform
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import List, Optional
+
+from config import Config
+
+try:
+    import pypdfium2 as pdfium
+    PDFIUM_AVAILABLE = True
+except ImportError:
+    PDFIUM_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Processes used to rasterize multi-page PDFs (1 renders in-process)
+PDF_RENDER_WORKERS = Config.PDF_RENDER_WORKERS
+
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+WINDOWS_POPPLER_PATHS = [
+    r'C:\Users\KIIT0001\Downloads\Release-25.12.0-0\poppler-25.12.0\Library\bin',
+    r'C:\Program Files\poppler\Library\bin',
+    r'C:\Program Files (x86)\poppler\Library\bin',
+]
+
+
+@lru_cache(maxsize=None)
+def find_poppler_path() -> Optional[str]:
+    """
+    Locate Poppler's bin directory once per process
+    
+    Returns:
+        Directory containing pdftoppm on Windows, None elsewhere (PATH is used)
+    """
+    if platform.system() != 'Windows':
+        return None
+    
+    for path in WINDOWS_POPPLER_PATHS + [os.getenv('POPPLER_PATH')]:
+        if path and os.path.exists(path):
+            return path
+    
+    pdftoppm_path = shutil.which('pdftoppm')
+    return os.path.dirname(pdftoppm_path) if pdftoppm_path else None
+
+
+def _get_render_pool() -> ProcessPoolExecutor:
+    """Return the process pool for page rendering, starting it on first use"""
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            # Spawn rather than fork: the server is multi-threaded, and a
+            # forked child can inherit locks held by other threads
+            _render_pool = ProcessPoolExecutor(
+                max_workers=PDF_RENDER_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _render_pool
+
+
+def _render_page_range(pdf_path: str, dpi: int, start: int, stop: int) -> List:
+    """Render pages [start, stop) of a PDF with pypdfium2"""
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        return [pdf[index].render(scale=dpi / 72).to_pil() for index in range(start, stop)]
+    finally:
+        pdf.close()
+
+
+def render_pdf_pages(pdf_path: str, dpi: int = 200, poppler_path: Optional[str] = None) -> List:
+    """
+    Render every page of a PDF to a PIL image
+    
+    Uses pypdfium2 to render in-process; falls back to pdf2image, which
+    shells out to Poppler's pdftoppm, when pypdfium2 is not installed.
+    Multi-page documents are split into contiguous page ranges rendered in
+    parallel across PDF_RENDER_WORKERS processes (PDFium is not thread-safe).
+    
+    Args:
+        pdf_path: Path to the PDF file
+        dpi: Render resolution
+        poppler_path: Poppler bin directory for the pdf2image fallback (auto-detected if None)
+        
+    Returns:
+        List of PIL images, one per page
+    """
+    if PDFIUM_AVAILABLE:
+        pdf = pdfium.PdfDocument(pdf_path)
+        try:
+            page_count = len(pdf)
+        finally:
+            pdf.close()
+        
+        # Daemonic processes (e.g. Celery prefork workers) cannot start a pool
+        workers = min(PDF_RENDER_WORKERS, page_count)
+        if workers <= 1 or multiprocessing.current_process().daemon:
+            return _render_page_range(pdf_path, dpi, 0, page_count)
+        
+        step = -(-page_count // workers)
+        futures = [
+            _get_render_pool().submit(_render_page_range, pdf_path, dpi, start, min(start + step, page_count))
+            for start in range(0, page_count, step)
+        ]
+        return [image for future in futures for image in future.result()]
+    
+    logger.info("pypdfium2 not installed, falling back to pdf2image/Poppler")
+    from pdf2image import convert_from_path
+    return convert_from_path(
+        pdf_path,
+        dpi=dpi,
+        poppler_path=poppler_path or find_poppler_path(),
+        thread_count=PDF_RENDER_WORKERS
+    )
@@ -0,0 +1,30 @@
+"""
+Retry Policy - Exponential backoff for rate-limited OCR backend calls
+"""
+
+import logging
+from tenacity import (
+    retry,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_exponential,
+    before_sleep_log,
+)
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitError(Exception):
+    """Raised when an OCR backend throttles a request (HTTP 429)"""
+
+
+# Config.OCR_RETRY_ATTEMPTS tries (default 3), waiting 1s, 2s, 4s... capped at 16s between tries
+ocr_retry = retry(
+    retry=retry_if_exception_type(RateLimitError),
+    wait=wait_exponential(multiplier=1, min=1, max=16),
+    stop=stop_after_attempt(Config.OCR_RETRY_ATTEMPTS),
+    before_sleep=before_sleep_log(logger, logging.WARNING),
+    reraise=True,
+)
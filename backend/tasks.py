@@ -0,0 +1,54 @@
+"""
+Background OCR tasks executed by Celery workers
+"""
+from celery_app import celery
+from database import db
+from models.database import Document
+
+
+@celery.task(bind=True, name='ocr.process_document')
+def process_document_task(self, document_id, use_cache=True):
+    """
+    Run Ollama OCR on an uploaded document and store the result
+    
+    Args:
+        document_id: ID of the Document to process
+        use_cache: Serve a cached result for identical file content
+        
+    Returns:
+        Dictionary with 'success', 'document_id', and 'ocr_result_id' or 'error'
+    """
+    from app import app
+    from routes.ocr_routes import run_ocr, store_ocr_result
+    from routes.analytics_routes import invalidate_analytics_cache
+    
+    with app.app_context():
+        document = db.session.get(Document, document_id)
+        if document is None:
+            return {'success': False, 'document_id': document_id, 'error': 'Document not found'}
+        
+        file_path, file_type = document.file_path, document.file_type
+        
+        # Only one worker may move a queued document to 'processing'; the
+        # claim commits, which also returns the connection to the pool.
+        # A redelivered task (its worker died mid-OCR) takes back the
+        # 'processing' claim the dead worker left behind.
+        redelivered = (self.request.delivery_info or {}).get('redelivered')
+        from_statuses = ('pending', 'processing') if redelivered else ('pending',)
+        if not Document.claim(document_id, from_statuses):
+            return {'success': False, 'document_id': document_id, 'error': 'Document already claimed'}
+        
+        try:
+            ocr_result = run_ocr(file_path, file_type, use_cache=use_cache)
+            ocr_result_id = store_ocr_result(document_id, ocr_result).id
+            db.session.commit()
+            invalidate_analytics_cache()
+            
+            return {'success': True, 'document_id': document_id, 'ocr_result_id': ocr_result_id}
+        
+        except Exception as e:
+            db.session.rollback()
+            Document.set_status(document_id, 'failed')
+            db.session.commit()
+            invalidate_analytics_cache()
+            return {'success': False, 'document_id': document_id, 'error': f'Ollama OCR processing failed: {str(e)}'}
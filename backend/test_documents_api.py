@@ -0,0 +1,366 @@
+#!/usr/bin/env python
+"""
+Tests for the document API and its database behaviour
+
+Runs the Flask app against a throwaway SQLite database file.
+"""
+
+import os
+import sys
+import tempfile
+from io import BytesIO
+
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Point the app at scratch storage before it is imported
+TEST_DIR = tempfile.mkdtemp(prefix='ocr_api_test_')
+os.environ.setdefault('DATABASE_URI', 'sqlite:///' + os.path.join(TEST_DIR, 'test.db'))
+os.environ.setdefault('CACHE_DIR', os.path.join(TEST_DIR, 'cache'))
+os.environ.setdefault('OCR_CACHE_DIR', os.path.join(TEST_DIR, 'ocr_cache'))
+
+from app import app, db
+from models.database import Document, OCRResult, ComplianceCheck, ComplianceDailyRollup
+from tasks import process_document_task
+from routes.analytics_routes import invalidate_analytics_cache
+
+
+@pytest.fixture
+def client(tmp_path):
+    """Create a test client backed by empty tables"""
+    app.config['TESTING'] = True
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+
+    with app.app_context():
+        db.create_all()
+        yield app.test_client()
+        db.session.remove()
+        db.drop_all()
+
+
+def add_document(filename='label.png', status='completed', **kwargs):
+    """Insert a document row and return its id"""
+    document = Document(
+        filename=filename,
+        file_path=os.path.join(app.config['UPLOAD_FOLDER'], filename),
+        file_type='png',
+        file_size=1,
+        status=status,
+        **kwargs
+    )
+    db.session.add(document)
+    db.session.commit()
+    return document.id
+
+
+class TestDocumentListPagination:
+    """Tests for the keyset-paginated document list"""
+
+    def test_pages_through_documents_inserted_together(self, client):
+        """Following next_cursor visits every document once, newest first"""
+        ids = [add_document(f'label{i}.png') for i in range(5)]
+
+        seen = []
+        cursor = None
+        for _ in range(len(ids) + 1):
+            query = {'limit': 2}
+            if cursor:
+                query['cursor'] = cursor
+            response = client.get('/api/ocr/documents', query_string=query)
+            assert response.status_code == 200
+            body = response.get_json()
+            seen.extend(row['id'] for row in body['data'])
+            cursor = body['next_cursor']
+            if cursor is None:
+                break
+
+        assert seen == sorted(ids, reverse=True)
+
+    def test_invalid_cursor_is_rejected(self, client):
+        response = client.get('/api/ocr/documents', query_string={'cursor': '!!!'})
+        assert response.status_code == 400
+        assert response.get_json() == {'error': 'Invalid cursor'}
+
+
+OCR_OUTPUT = {
+    'extracted_text': 'Drug: Aspirin',
+    'confidence_score': 0.9,
+    'processing_time': 0.1,
+    'drug_name': 'Aspirin'
+}
+
+
+class TestDocumentClaim:
+    """Tests for claiming documents for OCR"""
+
+    def test_only_one_claim_wins(self, client):
+        document_id = add_document(status='pending')
+
+        assert Document.claim(document_id, ('pending',))
+        assert not Document.claim(document_id, ('pending',))
+        assert db.session.get(Document, document_id).status == 'processing'
+
+    def test_fresh_processing_claim_is_kept(self, client):
+        document_id = add_document(status='pending')
+        Document.claim(document_id, ('pending',))
+
+        response = client.post(f'/api/ocr/process/{document_id}')
+        assert response.status_code == 409
+
+    def test_stale_processing_claim_is_taken_over(self, client):
+        """A document left in 'processing' by a dead request can be reprocessed"""
+        document_id = add_document(
+            status='processing',
+            claimed_at=datetime.utcnow() - timedelta(days=1)
+        )
+
+        with patch('routes.ocr_routes.run_ocr', return_value=OCR_OUTPUT) as mock_ocr:
+            response = client.post(f'/api/ocr/process/{document_id}')
+
+        assert response.status_code == 200
+        # Reprocessing always runs OCR afresh instead of reading the cache
+        assert mock_ocr.call_args.kwargs == {'use_cache': False}
+        assert response.get_json()['data']['drug_name'] == 'Aspirin'
+        assert db.session.get(Document, document_id).status == 'completed'
+
+    def test_document_being_uploaded_cannot_be_reclaimed(self, client):
+        """An upload still running OCR holds its claim against reprocessing"""
+        claims = []
+
+        def reprocess_during_ocr(file_path, file_type, use_cache=True):
+            document_id = Document.query.one().id
+            claims.append(client.post(f'/api/ocr/process/{document_id}').status_code)
+            claims.append(client.post(f'/api/ocr/process/{document_id}/async').status_code)
+            return OCR_OUTPUT
+
+        with patch('routes.ocr_routes.run_ocr', side_effect=reprocess_during_ocr):
+            response = client.post(
+                '/api/ocr/upload',
+                data={'file': (BytesIO(b'label bytes'), 'label.png')},
+                content_type='multipart/form-data'
+            )
+
+        assert response.status_code == 200
+        assert claims == [409, 409]
+
+    def test_redelivered_task_reclaims_its_document(self, client):
+        """A task redelivered after its worker died finishes the document"""
+        document_id = add_document(status='pending')
+        Document.claim(document_id, ('pending',))
+
+        process_document_task.push_request(delivery_info={'redelivered': True})
+        try:
+            with patch('routes.ocr_routes.run_ocr', return_value=OCR_OUTPUT):
+                result = process_document_task(document_id)
+        finally:
+            process_document_task.pop_request()
+
+        assert result['success']
+        db.session.expire_all()
+        assert db.session.get(Document, document_id).status == 'completed'
+
+    def test_first_delivery_does_not_steal_a_claim(self, client):
+        document_id = add_document(status='pending')
+        Document.claim(document_id, ('pending',))
+
+        with patch('routes.ocr_routes.run_ocr', return_value=OCR_OUTPUT) as mock_ocr:
+            result = process_document_task(document_id)
+
+        assert not result['success']
+        mock_ocr.assert_not_called()
+
+
+def rollup_counts():
+    """Return the daily rollup as {(day, status): count}"""
+    return {(row.day, row.status): row.count for row in ComplianceDailyRollup.query.all()}
+
+
+class TestComplianceRollup:
+    """Tests for the daily compliance rollup"""
+
+    def test_backfilled_from_existing_checks(self, client):
+        """Creating the rollup table counts checks stored before it existed"""
+        document_id = add_document()
+        ocr_result = OCRResult(document_id=document_id, extracted_text='Drug: Aspirin')
+        db.session.add(ocr_result)
+        db.session.flush()
+        checked_date = datetime(2026, 1, 2, 3, 4, 5)
+        for status in ('passed', 'passed', 'failed'):
+            db.session.add(ComplianceCheck(ocr_result_id=ocr_result.id, status=status, checked_date=checked_date))
+        db.session.commit()
+
+        ComplianceDailyRollup.__table__.drop(db.engine)
+        db.create_all()
+        assert rollup_counts() == {
+            (checked_date.date(), 'passed'): 2,
+            (checked_date.date(), 'failed'): 1
+        }
+
+        # Deleting the document takes its checks back out without going negative
+        client.delete(f'/api/ocr/documents/{document_id}')
+        assert set(rollup_counts().values()) == {0}
+
+    def test_validation_counts_checks_and_delete_removes_them(self, client):
+        document_id = add_document()
+        ocr_result = OCRResult(document_id=document_id, extracted_text='Drug: Aspirin', drug_name='Aspirin')
+        db.session.add(ocr_result)
+        db.session.commit()
+        result_id = ocr_result.id
+
+        response = client.post(f'/api/ocr/results/{result_id}/validate')
+        assert response.status_code == 200
+        checks = response.get_json()['checks']
+        assert sum(rollup_counts().values()) == len(checks) > 0
+
+        client.delete(f'/api/ocr/documents/{document_id}')
+        assert set(rollup_counts().values()) == {0}
+
+
+class TestDashboard:
+    """Tests for the analytics dashboard summary"""
+
+    def test_compliance_counts_by_status(self, client):
+        document_id = add_document()
+        ocr_result = OCRResult(document_id=document_id, extracted_text='Drug: Aspirin', confidence_score=0.8)
+        db.session.add(ocr_result)
+        db.session.flush()
+        for status in ('passed', 'passed', 'failed', 'warning'):
+            db.session.add(ComplianceCheck(ocr_result_id=ocr_result.id, status=status))
+        db.session.commit()
+        invalidate_analytics_cache()
+
+        response = client.get('/api/analytics/dashboard')
+
+        assert response.status_code == 200
+        data = response.get_json()['data']
+        assert data['compliance'] == {'total_checks': 4, 'passed': 2, 'failed': 1, 'pass_rate': 50.0}
+        assert data['average_confidence'] == 0.8
+        assert data['total_errors'] == 0
+
+    def test_empty_database(self, client):
+        invalidate_analytics_cache()
+        data = client.get('/api/analytics/dashboard').get_json()['data']
+        assert data['compliance']['total_checks'] == 0
+        assert data['compliance']['pass_rate'] == 0
+
+
+class TestBatchValidate:
+    """Tests for validating many OCR results in one request"""
+
+    def test_validates_found_results_and_reports_missing(self, client):
+        document_id = add_document()
+        results = [
+            OCRResult(document_id=document_id, extracted_text='Drug: Aspirin', drug_name='Aspirin'),
+            OCRResult(document_id=document_id, extracted_text='')
+        ]
+        db.session.add_all(results)
+        db.session.commit()
+        result_ids = [result.id for result in results]
+
+        response = client.post('/api/ocr/results/batch_validate', json={'result_ids': result_ids + [999]})
+
+        assert response.status_code == 200
+        body = response.get_json()
+        assert [item['result_id'] for item in body['results']] == result_ids
+        assert body['missing'] == [999]
+
+        # Scores are stored on the results and every check is counted once
+        db.session.expire_all()
+        for item in body['results']:
+            assert db.session.get(OCRResult, item['result_id']).compliance_score == item['compliance_score']
+        assert sum(rollup_counts().values()) == sum(len(item['checks']) for item in body['results'])
+
+    @pytest.mark.parametrize('payload', [
+        {},
+        {'result_ids': []},
+        {'result_ids': ['1']},
+        {'result_ids': 1},
+        {'result_ids': [True]}
+    ])
+    def test_rejects_malformed_ids(self, client, payload):
+        response = client.post('/api/ocr/results/batch_validate', json=payload)
+        assert response.status_code == 400
+
+
+class TestUploadDeduplication:
+    """Tests for reusing results of previously processed content"""
+
+    def upload(self, client, content, filename):
+        return client.post(
+            '/api/ocr/upload',
+            data={'file': (BytesIO(content), filename)},
+            content_type='multipart/form-data'
+        )
+
+    def test_identical_content_reuses_the_stored_result(self, client, tmp_path):
+        with patch('routes.ocr_routes.run_ocr', return_value=OCR_OUTPUT) as mock_ocr:
+            first = self.upload(client, b'label bytes', 'first.png')
+            second = self.upload(client, b'label bytes', 'second.png')
+
+        assert first.status_code == second.status_code == 200
+        assert mock_ocr.call_count == 1
+        assert second.get_json()['duplicate'] is True
+        assert second.get_json()['document_id'] == first.get_json()['document_id']
+        assert second.get_json()['ocr_result_id'] == first.get_json()['ocr_result_id']
+        assert len(list(tmp_path.iterdir())) == 1
+
+    def test_different_content_is_processed(self, client, tmp_path):
+        with patch('routes.ocr_routes.run_ocr', return_value=OCR_OUTPUT) as mock_ocr:
+            first = self.upload(client, b'label bytes', 'label.png')
+            second = self.upload(client, b'other label bytes', 'label.png')
+
+        assert mock_ocr.call_count == 2
+        assert 'duplicate' not in second.get_json()
+        assert second.get_json()['document_id'] != first.get_json()['document_id']
+        assert len(list(tmp_path.iterdir())) == 2
+
+
+
+class TestMalformedUploads:
+    """Tests for rejecting broken multipart bodies"""
+
+    BOUNDARY = 'test-boundary'
+
+    def post_raw(self, client, body, content_type=None):
+        return client.post(
+            '/api/ocr/upload',
+            data=body,
+            content_type=content_type or f'multipart/form-data; boundary={self.BOUNDARY}'
+        )
+
+    def file_part(self):
+        return (
+            f'--{self.BOUNDARY}\r\n'
+            'Content-Disposition: form-data; name="file"; filename="label.png"\r\n'
+            'Content-Type: image/png\r\n\r\n'
+            'label bytes'
+        ).encode()
+
+    def test_truncated_body_is_rejected(self, client, tmp_path):
+        response = self.post_raw(client, self.file_part())
+
+        assert response.status_code == 400
+        assert response.get_json() == {'error': 'Malformed multipart body'}
+        assert list(tmp_path.iterdir()) == []
+
+    def test_missing_boundary_is_rejected(self, client, tmp_path):
+        response = self.post_raw(client, self.file_part(), content_type='multipart/form-data')
+
+        assert response.status_code == 400
+        assert response.get_json() == {'error': 'Malformed multipart body'}
+        assert list(tmp_path.iterdir()) == []
+
+    def test_complete_body_is_accepted(self, client):
+        body = self.file_part() + f'\r\n--{self.BOUNDARY}--\r\n'.encode()
+        with patch('routes.ocr_routes.run_ocr', return_value=OCR_OUTPUT):
+            response = self.post_raw(client, body)
+
+        assert response.status_code == 200
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
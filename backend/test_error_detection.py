@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""
+Unit tests for the error detection service
+"""
+
+import os
+import sys
+
+import pytest
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.error_detection_service import ErrorDetectionService
+
+
+@pytest.fixture
+def error_service():
+    return ErrorDetectionService()
+
+
+class TestBatchNumberCorrection:
+    """Tests for repairing OCR-garbled batch numbers"""
+
+    @pytest.mark.parametrize('garbled, expected', [
+        ('BN-2O24-00I234', 'BN-2024-001234'),
+        ('8N-2024-001234', 'BN-2024-001234'),
+        ('B N-2024-0012S4', 'BN-2024-001254'),
+        ('bn-2024-001234', 'BN-2024-001234'),
+    ])
+    def test_common_misreads_are_repaired(self, error_service, garbled, expected):
+        assert error_service._correct_batch_number(garbled) == expected
+
+    @pytest.mark.parametrize('garbled', [
+        'BN2024001234',
+        'BN-2024-00123',
+        'BN-20X4-001234',
+        '',
+    ])
+    def test_unrepairable_values_return_none(self, error_service, garbled):
+        assert error_service._correct_batch_number(garbled) is None
+
+    def test_check_suggests_the_repaired_value(self, error_service):
+        [error] = error_service._check_batch_number('BN-2O24-00I234')
+        assert error['expected_value'] == 'BN-2024-001234'
+        assert error['suggestion'] == "Did you mean 'BN-2024-001234'?"
+
+    def test_check_falls_back_to_the_format_hint(self, error_service):
+        [error] = error_service._check_batch_number('BN2024')
+        assert error['expected_value'] == 'BN-YYYY-NNNNNN'
+
+    def test_valid_batch_number_has_no_errors(self, error_service):
+        assert error_service._check_batch_number('BN-2024-001234') == []
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -250,7 +250,7 @@ class TestOllamaOCRServiceProperties:
         For any PDF with multiple pages, results should be combined with page breaks.
         """
         # Mock PDF processing
-        with patch('pdf2image.convert_from_path') as mock_convert:
+        with patch('services.ollama_ocr_service.render_pdf_pages') as mock_convert:
             # Create mock images
             mock_images = []
             for _ in range(num_pages):
@@ -368,6 +368,145 @@ class TestOllamaServiceInitialization:
         
         assert service.ollama_endpoint == "http://localhost:11434"
         assert service.api_endpoint == "http://localhost:11434/api/generate"
+    
+    @pytest.mark.parametrize("device, options", [
+        ('auto', {}),
+        ('cpu', {'num_gpu': 0}),
+        ('cuda', {'num_gpu': 999}),
+        ('CUDA:1', {'num_gpu': 999, 'main_gpu': 1}),
+        ('cuda:x', {}),
+        ('cuda:', {}),
+        ('tpu', {}),
+    ])
+    def test_device_options(self, device, options):
+        """Device settings map to Ollama options; invalid ones fall back to automatic"""
+        service = OllamaOCRService(
+            ollama_endpoint="http://localhost:11434",
+            model_name="glm-ocr:latest",
+            timeout=30,
+            device=device
+        )
+        
+        assert service.model_options == options
+    
+    def test_supported_languages_cannot_be_corrupted(self):
+        """Changing the returned languages does not affect later calls"""
+        service = OllamaOCRService(
+            ollama_endpoint="http://localhost:11434",
+            model_name="glm-ocr:latest",
+            timeout=30
+        )
+        
+        languages = service.get_supported_languages()
+        languages.pop('en')
+        
+        assert service.get_supported_languages()['en'] == 'English'
+
+
+class TestOllamaRetryPolicy:
+    """Tests for the rate-limit retry policy around Ollama requests"""
+    
+    @pytest.fixture
+    def ollama_service(self):
+        return OllamaOCRService(
+            ollama_endpoint="http://localhost:11434",
+            model_name="glm-ocr:latest",
+            timeout=30
+        )
+    
+    def test_rate_limited_request_is_retried(self, ollama_service):
+        """A 429 response is retried and the later success is returned"""
+        throttled = Mock(status_code=429, text="Too Many Requests")
+        ok = Mock(status_code=200)
+        ok.json.return_value = {'response': 'Drug: Aspirin'}
+        
+        with patch('requests.post', side_effect=[throttled, ok]) as mock_post, \
+                patch('time.sleep'):
+            text = ollama_service._send_to_ollama("aW1hZ2U=")
+        
+        assert text == 'Drug: Aspirin'
+        assert mock_post.call_count == 2
+    
+    def test_server_error_is_not_retried(self, ollama_service):
+        """Non-throttling errors fail on the first attempt"""
+        with patch('requests.post', return_value=Mock(status_code=500, text="boom")) as mock_post, \
+                patch('time.sleep'):
+            with pytest.raises(Exception):
+                ollama_service._send_to_ollama("aW1hZ2U=")
+        
+        assert mock_post.call_count == 1
+    
+    def test_server_error_mentioning_rate_limit_is_not_retried(self, ollama_service):
+        """Only the 429 status triggers a retry, not throttling words in an error body"""
+        error_body = "upstream returned 429: rate limit quota exceeded"
+        with patch('requests.post', return_value=Mock(status_code=500, text=error_body)) as mock_post, \
+                patch('time.sleep'):
+            with pytest.raises(Exception):
+                ollama_service._send_to_ollama("aW1hZ2U=")
+        
+        assert mock_post.call_count == 1
+
+
+class TestOllamaResultCache:
+    """Tests for the content-hash OCR result cache"""
+    
+    def test_identical_content_is_served_from_cache(self, tmp_path):
+        """Re-processing the same bytes returns the cached result without calling Ollama"""
+        service = OllamaOCRService(
+            ollama_endpoint="http://localhost:11434",
+            model_name="glm-ocr:latest",
+            timeout=30,
+            cache_dir=str(tmp_path / "cache")
+        )
+        image_bytes = io.BytesIO()
+        Image.new('RGB', (50, 50), color='white').save(image_bytes, format='PNG')
+        first = tmp_path / "first.png"
+        second = tmp_path / "second.png"
+        first.write_bytes(image_bytes.getvalue())
+        second.write_bytes(image_bytes.getvalue())
+        
+        with patch.object(service, '_send_to_ollama', return_value='Drug: Aspirin') as mock_send:
+            result_first = service.process_image(str(first))
+            result_second = service.process_image(str(second))
+        
+        assert mock_send.call_count == 1
+        assert result_second == result_first
+    
+    @staticmethod
+    def _cached_service_and_image(tmp_path):
+        service = OllamaOCRService(
+            ollama_endpoint="http://localhost:11434",
+            model_name="glm-ocr:latest",
+            timeout=30,
+            cache_dir=str(tmp_path / "cache")
+        )
+        image_path = tmp_path / "label.png"
+        Image.new('RGB', (50, 50), color='white').save(image_path, format='PNG')
+        return service, str(image_path)
+    
+    def test_use_cache_false_runs_ocr_again(self, tmp_path):
+        """Bypassing the cache re-runs OCR and refreshes the stored result"""
+        service, image_path = self._cached_service_and_image(tmp_path)
+        
+        with patch.object(service, '_send_to_ollama', side_effect=['Drug: Aspirn', 'Drug: Aspirin']) as mock_send:
+            service.process_image(image_path)
+            fresh = service.process_image(image_path, use_cache=False)
+            cached = service.process_image(image_path)
+        
+        assert mock_send.call_count == 2
+        assert fresh['extracted_text'] == 'Drug: Aspirin'
+        assert cached == fresh
+    
+    def test_empty_text_is_not_cached(self, tmp_path):
+        """A blank read is retried on the next call instead of being served from cache"""
+        service, image_path = self._cached_service_and_image(tmp_path)
+        
+        with patch.object(service, '_send_to_ollama', side_effect=['', 'Drug: Aspirin']) as mock_send:
+            service.process_image(image_path)
+            result = service.process_image(image_path)
+        
+        assert mock_send.call_count == 2
+        assert result['extracted_text'] == 'Drug: Aspirin'
 
 
 if __name__ == '__main__':